@@ -0,0 +1,214 @@
+"""Export activities to a columnar snapshot for offline reporting.
+
+Streams activities (without image bytes) joined with category and user
+metadata out of the serving database into Parquet or Arrow IPC files
+partitioned by month:
+
+    <output>/month=YYYY-MM/part-<first_id>-<last_id>.parquet
+
+Exports are incremental: the highest exported activity_id is stored in
+<output>/_watermark.json and only newer rows are read on the next run. Use
+--full after rewriting historical rows (e.g. a factor recompute) to rebuild
+the snapshot from scratch.
+
+Rows are read with one short keyset query per chunk, so no read lock is
+held on the serving database while parts are encoded and written. Parts are
+written under temporary names and renamed into place just before the
+watermark advances; parts above the watermark left by a failed run are
+removed first, so a retry never leaves overlapping parts behind.
+
+Usage:
+    python analytics_export.py --output exports/activities
+    python analytics_export.py --output exports/activities --format arrow --full
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from database import get_db_path
+
+WATERMARK_FILE = "_watermark.json"
+DEFAULT_CHUNK_SIZE = 50000
+
+EXPORT_QUERY = """
+    SELECT a.activity_id, a.user_id, u.name as user_name, u.user_type,
+           a.category_id, c.name as category_name, a.description,
+           a.quantity, a.points, a.carbon_offset, a.date_time,
+           a.image_data IS NOT NULL as has_image,
+           a.upvote_count, a.comment_count,
+           strftime('%Y-%m', a.date_time) as month
+    FROM activities a
+    JOIN categories c ON a.category_id = c.category_id
+    JOIN users u ON a.user_id = u.user_id
+    WHERE a.activity_id > ?
+    ORDER BY a.activity_id
+    LIMIT ?
+"""
+
+PART_PATTERN = re.compile(r"part-(\d+)-(\d+)\.")
+PENDING_PREFIX = "_pending-"
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("activity_id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("user_name", pa.string()),
+    ("user_type", pa.string()),
+    ("category_id", pa.int64()),
+    ("category_name", pa.string()),
+    ("description", pa.string()),
+    ("quantity", pa.float64()),
+    ("points", pa.float64()),
+    ("carbon_offset", pa.float64()),
+    ("date_time", pa.timestamp("s")),
+    ("has_image", pa.bool_()),
+    ("upvote_count", pa.int64()),
+    ("comment_count", pa.int64()),
+])
+
+FORMAT_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def get_readonly_connection(db_path=None):
+    """Open the serving database read-only so the export never takes a write lock"""
+    db_path = db_path or get_db_path()
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def read_watermark(output_dir):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        return json.load(f)["last_activity_id"]
+
+
+def write_watermark(output_dir, last_activity_id):
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "last_activity_id": last_activity_id,
+            "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def rows_to_table(rows):
+    columns = defaultdict(list)
+    for row in rows:
+        for name, value in zip(SNAPSHOT_SCHEMA.names, row):
+            columns[name].append(value)
+    columns["date_time"] = [
+        datetime.fromisoformat(value) if value else None for value in columns["date_time"]
+    ]
+    columns["has_image"] = [bool(value) for value in columns["has_image"]]
+    return pa.table({name: columns[name] for name in SNAPSHOT_SCHEMA.names}, schema=SNAPSHOT_SCHEMA)
+
+
+def write_part(table, output_dir, month, file_format):
+    first_id = table.column("activity_id")[0].as_py()
+    last_id = table.column("activity_id")[-1].as_py()
+    partition_dir = os.path.join(output_dir, f"month={month}")
+    os.makedirs(partition_dir, exist_ok=True)
+    name = f"part-{first_id:012d}-{last_id:012d}.{FORMAT_EXTENSIONS[file_format]}"
+    path = os.path.join(partition_dir, PENDING_PREFIX + name)
+
+    if file_format == "parquet":
+        pq.write_table(table, path)
+    else:
+        with ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def commit_parts(pending_paths):
+    """Rename this run's parts to their final names; returns the final paths"""
+    paths = []
+    for pending_path in pending_paths:
+        directory, name = os.path.split(pending_path)
+        path = os.path.join(directory, name[len(PENDING_PREFIX):])
+        os.replace(pending_path, path)
+        paths.append(path)
+    return paths
+
+
+def remove_uncommitted_parts(output_dir, watermark):
+    """Drop pending files and any part above the watermark left behind by a failed run"""
+    for path in glob.glob(os.path.join(output_dir, "month=*", "*")):
+        name = os.path.basename(path)
+        match = PART_PATTERN.match(name)
+        if name.startswith(PENDING_PREFIX) or (match and int(match.group(1)) > watermark):
+            os.remove(path)
+
+
+def export_activities(output_dir, file_format="parquet", chunk_size=DEFAULT_CHUNK_SIZE,
+                      full=False, db_path=None):
+    """Export activities newer than the watermark; returns (rows exported, files written)"""
+    if file_format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    if full and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    watermark = read_watermark(output_dir)
+    remove_uncommitted_parts(output_dir, watermark)
+    conn = get_readonly_connection(db_path)
+    rows_exported = 0
+    files = []
+
+    try:
+        while True:
+            # One short query per chunk: the read lock is released before any file I/O
+            chunk = conn.execute(EXPORT_QUERY, (watermark, chunk_size)).fetchall()
+            if not chunk:
+                break
+
+            by_month = defaultdict(list)
+            for row in chunk:
+                by_month[row[-1] or "unknown"].append(row[:-1])
+
+            for month, rows in by_month.items():
+                files.append(write_part(rows_to_table(rows), output_dir, month, file_format))
+
+            rows_exported += len(chunk)
+            watermark = chunk[-1][0]
+    finally:
+        conn.close()
+
+    # Only publish parts and advance the watermark once every part of this run is on disk
+    files = commit_parts(files)
+    if rows_exported:
+        write_watermark(output_dir, watermark)
+    return rows_exported, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export activities to a columnar snapshot")
+    parser.add_argument("--output", default="exports/activities", help="Snapshot directory")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--full", action="store_true", help="Discard the snapshot and re-export everything")
+    parser.add_argument("--db", help="SQLite database path (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+
+    rows_exported, files = export_activities(
+        args.output, args.format, args.chunk_size, args.full, args.db
+    )
+    print(f"Exported {rows_exported} activities into {len(files)} file(s) under {args.output}")
+
+
+if __name__ == "__main__":
+    main()
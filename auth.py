@@ -0,0 +1,169 @@
+"""Password hashing for /register and /login.
+
+bcrypt work runs on a small dedicated thread pool (bcrypt releases the GIL
+while hashing) with a cap on how many hashes may be running or queued. When
+the cap is reached new requests fail fast with AuthBusyError instead of
+piling up, so a login storm can use at most AUTH_HASH_WORKERS cores.
+
+On FastAPI waiting hashes only hold the event loop's futures. On Flask each
+waiting hash also holds a request thread, so every other endpoint keeps its
+threads only while AUTH_HASH_QUEUE_LIMIT (default 2 * AUTH_HASH_WORKERS)
+stays below the server's thread count.
+
+Rows created before bcrypt was introduced store "hashed_<password>"; they
+are verified the old way and transparently upgraded on the next successful
+login, as are bcrypt hashes with fewer rounds than BCRYPT_ROUNDS.
+
+Run `python auth.py --benchmark` to pick BCRYPT_ROUNDS / AUTH_HASH_WORKERS
+for a target login throughput.
+"""
+import argparse
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config import BCRYPT_ROUNDS, AUTH_HASH_WORKERS, AUTH_HASH_QUEUE_LIMIT, AUTH_HASH_TIMEOUT
+
+LEGACY_PREFIX = "hashed_"
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+class AuthBusyError(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=AUTH_HASH_WORKERS,
+                 queue_limit=AUTH_HASH_QUEUE_LIMIT, timeout=AUTH_HASH_TIMEOUT):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth-hash")
+        self._slots = threading.BoundedSemaphore(max(queue_limit, workers))
+        # A well-formed hash at the configured cost: checking against it costs as much
+        # as a real check, but building it needs no bcrypt work at import time
+        self._dummy_hash = bcrypt.gensalt(self.rounds).decode("ascii") + "." * 31
+
+    # Blocking primitives, run on the pool
+    def _hash(self, password):
+        return bcrypt.hashpw(_encode(password), bcrypt.gensalt(self.rounds)).decode("ascii")
+
+    def _verify(self, password, stored_hash):
+        """Return (matches, replacement hash or None)"""
+        if stored_hash.startswith(LEGACY_PREFIX):
+            matches = hmac.compare_digest(stored_hash.encode("utf-8"), f"{LEGACY_PREFIX}{password}".encode("utf-8"))
+            return matches, self._hash(password) if matches else None
+
+        try:
+            matches = bcrypt.checkpw(_encode(password), stored_hash.encode("ascii"))
+        except ValueError:
+            return False, None
+        if matches and _rounds_of(stored_hash) < self.rounds:
+            return True, self._hash(password)
+        return matches, None
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusyError("Too many concurrent logins, please retry")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    # Thread-based callers (Flask)
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise AuthBusyError("Password check timed out, please retry")
+
+    def hash_password(self, password):
+        return self._wait(self._submit(self._hash, password))
+
+    def verify_password(self, password, stored_hash):
+        return self._wait(self._submit(self._verify, password, stored_hash))
+
+    def burn_verify(self, password):
+        """Spend the same time as a real check so unknown emails are not distinguishable"""
+        self.verify_password(password, self._dummy_hash)
+        return False, None
+
+    # Event-loop callers (FastAPI)
+    async def _wait_async(self, future):
+        # Imported here so the Flask app does not pay for loading asyncio at startup
+        import asyncio
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise AuthBusyError("Password check timed out, please retry")
+
+    async def hash_password_async(self, password):
+        return await self._wait_async(self._submit(self._hash, password))
+
+    async def verify_password_async(self, password, stored_hash):
+        return await self._wait_async(self._submit(self._verify, password, stored_hash))
+
+    async def burn_verify_async(self, password):
+        await self.verify_password_async(password, self._dummy_hash)
+        return False, None
+
+
+def _encode(password):
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def _rounds_of(stored_hash):
+    # "$2b$12$..." -> 12
+    try:
+        return int(stored_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+hasher = PasswordHasher()
+
+
+def benchmark(rounds_options, workers, duration):
+    print(f"{'rounds':>6}{'ms/hash':>10}{'logins/s':>10}  (with {workers} worker(s))")
+    for rounds in rounds_options:
+        bench = PasswordHasher(rounds=rounds, workers=workers, queue_limit=workers * 4, timeout=60)
+        stored = bench._hash("benchmark-password")
+
+        started = time.perf_counter()
+        bench._verify("benchmark-password", stored)
+        single = time.perf_counter() - started
+
+        completed = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            futures = [bench._executor.submit(bench._verify, "benchmark-password", stored) for _ in range(workers)]
+            for future in futures:
+                future.result()
+            completed += len(futures)
+        elapsed = time.perf_counter() - started
+        bench._executor.shutdown()
+        print(f"{rounds:>6}{single * 1000:>10.1f}{completed / elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing utilities")
+    parser.add_argument("--benchmark", action="store_true", help="Measure login throughput per bcrypt cost")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, default=AUTH_HASH_WORKERS)
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per cost setting")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.rounds, args.workers, args.duration)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,3 +10,34 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecobuddy.db")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# Password hashing configuration
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "4"))          # Threads doing bcrypt work
+# Max hashes running or waiting. Flask request threads block while their hash waits,
+# so keep this below the server's thread count (e.g. gunicorn --threads) or a login
+# storm can still occupy every thread; the default allows one queued hash per worker.
+AUTH_HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE_LIMIT", str(AUTH_HASH_WORKERS * 2)))
+AUTH_HASH_TIMEOUT = float(os.getenv("AUTH_HASH_TIMEOUT", "10"))        # Seconds to wait for a result
+
+# Rate limiting configuration (token buckets keyed by user id, or IP when unauthenticated)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per process) or "sqlite" (shared)
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "./ratelimit.db")
+RATE_LIMIT_IDLE_SECONDS = int(os.getenv("RATE_LIMIT_IDLE_SECONDS", "600"))  # Evict buckets idle this long
+
+# Route prefix -> (tokens refilled per second, bucket size)
+RATE_LIMIT_DEFAULT = (10.0, 30)
+RATE_LIMITS = {
+    "/leaderboard": (1.0, 10),
+    "/challenge-leaderboard": (1.0, 10),
+    "/team-leaderboard": (1.0, 10),
+    "/user-stats": (2.0, 10),
+    "/user-activities": (1.0, 5),
+    "/upload-activity": (0.2, 5),
+    # Login and register have no token yet, so they are keyed by client IP, which a
+    # whole office behind one NAT address shares; the bcrypt pool's queue limit
+    # (AUTH_HASH_QUEUE_LIMIT) is what actually bounds hashing load.
+    "/login": (20.0, 100),
+    "/register": (2.0, 20),
+}
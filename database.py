@@ -4,9 +4,11 @@ from config import DATABASE_URL
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    db_path = DATABASE_URL.replace("sqlite:///", "")
-    conn = sqlite3.connect(db_path)
+def get_db_path():
+    return DATABASE_URL.replace("sqlite:///", "")
+
+def get_db_connection(check_same_thread=True):
+    conn = sqlite3.connect(get_db_path(), check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -0,0 +1,222 @@
+import base64
+
+# Feed queries shared by flask_app.py and main.py.
+# Upvote and comment counts are read from the counter columns on
+# activities (kept up to date by triggers in schema.sql), so a page of the
+# feed never runs a COUNT over upvotes or comments.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+COMMENT_PREVIEW_SIZE = 3
+# Activity rows carry image bytes, so /user-activities streams small chunks
+USER_ACTIVITIES_CHUNK_SIZE = 100
+
+FEED_SELECT = """
+    SELECT a.activity_id, a.user_id, a.category_id, a.description, a.quantity,
+           a.points, a.carbon_offset, a.date_time,
+           a.image_data IS NOT NULL as has_image,
+           a.upvote_count, a.comment_count,
+           c.name as category_name, u.name as user_name,
+           uv.upvote_id IS NOT NULL as upvoted_by_me
+    FROM activities a
+    JOIN categories c ON a.category_id = c.category_id
+    JOIN users u ON a.user_id = u.user_id
+    LEFT JOIN upvotes uv ON uv.activity_id = a.activity_id AND uv.user_id = ?
+"""
+
+COMMENT_PREVIEW_QUERY = """
+    SELECT comment_id, activity_id, user_id, user_name, text, date_posted
+    FROM (
+        SELECT cm.comment_id, cm.activity_id, cm.user_id, u.name as user_name,
+               cm.text, cm.date_posted,
+               ROW_NUMBER() OVER (
+                   PARTITION BY cm.activity_id
+                   ORDER BY cm.date_posted DESC, cm.comment_id DESC
+               ) as rn
+        FROM comments cm
+        JOIN users u ON cm.user_id = u.user_id
+        WHERE cm.activity_id IN ({placeholders})
+    )
+    WHERE rn <= ?
+    ORDER BY activity_id, date_posted DESC, comment_id DESC
+"""
+
+USER_ACTIVITIES_QUERY = """
+    SELECT a.*, c.name as category_name, u.name as user_name
+    FROM activities a
+    JOIN categories c ON a.category_id = c.category_id
+    JOIN users u ON a.user_id = u.user_id
+    WHERE a.user_id = ? {after}
+    ORDER BY a.date_time DESC, a.activity_id DESC
+    LIMIT ?
+"""
+
+
+def encode_cursor(date_time, activity_id):
+    raw = f"{date_time}|{activity_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return the (date_time, activity_id) keyset position encoded in a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        date_time, activity_id = raw.rsplit('|', 1)
+        return date_time, int(activity_id)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def get_feed(db, viewer_id, cursor=None, limit=None, user_id=None, team_id=None):
+    """Return one page of the activity feed, newest first.
+
+    Pass user_id for a single user's feed or team_id for a team feed; with
+    neither the global feed is returned. Pages are keyset-paginated on
+    (date_time, activity_id) so deep pages cost the same as the first one.
+    """
+    limit = parse_limit(limit)
+
+    conditions = []
+    params = [viewer_id]
+
+    if user_id is not None:
+        conditions.append("a.user_id = ?")
+        params.append(user_id)
+    if team_id is not None:
+        conditions.append("a.user_id IN (SELECT user_id FROM team_members WHERE team_id = ?)")
+        params.append(team_id)
+    if cursor:
+        date_time, activity_id = decode_cursor(cursor)
+        conditions.append("(a.date_time, a.activity_id) < (?, ?)")
+        params.extend([date_time, activity_id])
+
+    query = FEED_SELECT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # Fetch one extra row to know whether there is a next page
+    query += " ORDER BY a.date_time DESC, a.activity_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db.execute_query(query, tuple(params))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    activities = []
+    for row in rows:
+        activity = dict(row)
+        activity['has_image'] = bool(activity['has_image'])
+        activity['upvoted_by_me'] = bool(activity['upvoted_by_me'])
+        activity['comments'] = []
+        activities.append(activity)
+
+    attach_comment_previews(db, activities)
+
+    next_cursor = None
+    if has_more and activities:
+        last = activities[-1]
+        next_cursor = encode_cursor(last['date_time'], last['activity_id'])
+
+    return {"activities": activities, "next_cursor": next_cursor}
+
+
+def iter_user_activities(connect, user_id, chunk_size=USER_ACTIVITIES_CHUNK_SIZE):
+    """Yield all of a user's activities, newest first, in batches of rows.
+
+    Each batch is one keyset query fetched in full before it is yielded, so
+    no read (and its SQLite shared lock) stays open while the caller sends
+    the batch to a slow client. The connection is opened on first iteration
+    and closed when the generator finishes or is closed.
+    """
+    conn = connect()
+    try:
+        position = ()
+        while True:
+            after = "AND (a.date_time, a.activity_id) < (?, ?)" if position else ""
+            query = USER_ACTIVITIES_QUERY.format(after=after)
+            rows = conn.execute(query, (user_id, *position, chunk_size)).fetchall()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            position = (rows[-1]['date_time'], rows[-1]['activity_id'])
+    finally:
+        conn.close()
+
+
+def attach_comment_previews(db, activities, preview_size=COMMENT_PREVIEW_SIZE):
+    """Load the latest comments for a whole page of activities in one query"""
+    if not activities:
+        return
+
+    by_id = {activity['activity_id']: activity for activity in activities}
+    placeholders = ", ".join("?" for _ in by_id)
+    query = COMMENT_PREVIEW_QUERY.format(placeholders=placeholders)
+    comments = db.execute_query(query, (*by_id.keys(), preview_size))
+
+    for comment in comments:
+        comment = dict(comment)
+        by_id[comment['activity_id']]['comments'].append(comment)
+
+
+def add_upvote(db, user_id, activity_id):
+    """Upvote an activity; returns False if the user had already upvoted it"""
+    query = "INSERT OR IGNORE INTO upvotes (user_id, activity_id) VALUES (?, ?)"
+    db.execute_query(query, (user_id, activity_id))
+    return db.cursor.rowcount > 0
+
+
+def remove_upvote(db, user_id, activity_id):
+    query = "DELETE FROM upvotes WHERE user_id = ? AND activity_id = ?"
+    db.execute_query(query, (user_id, activity_id))
+    return db.cursor.rowcount > 0
+
+
+def get_counts(db, activity_id):
+    query = "SELECT upvote_count, comment_count FROM activities WHERE activity_id = ?"
+    result = db.execute_query(query, (activity_id,))
+    return dict(result[0]) if result else None
+
+
+def add_comment(db, user_id, activity_id, text):
+    query = "INSERT INTO comments (user_id, activity_id, text) VALUES (?, ?, ?)"
+    db.execute_query(query, (user_id, activity_id, text))
+    comment_id = db.cursor.lastrowid
+
+    query = """
+        SELECT cm.comment_id, cm.activity_id, cm.user_id, u.name as user_name,
+               cm.text, cm.date_posted
+        FROM comments cm
+        JOIN users u ON cm.user_id = u.user_id
+        WHERE cm.comment_id = ?
+    """
+    return dict(db.execute_query(query, (comment_id,))[0])
+
+
+def get_comments(db, activity_id, cursor=None, limit=None):
+    """Return one page of an activity's comments, newest first"""
+    limit = parse_limit(limit)
+    params = [activity_id]
+    query = """
+        SELECT cm.comment_id, cm.activity_id, cm.user_id, u.name as user_name,
+               cm.text, cm.date_posted
+        FROM comments cm
+        JOIN users u ON cm.user_id = u.user_id
+        WHERE cm.activity_id = ?
+    """
+    if cursor:
+        query += " AND cm.comment_id < ?"
+        params.append(int(cursor))
+    query += " ORDER BY cm.comment_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db.execute_query(query, tuple(params))
+    has_more = len(rows) > limit
+    comments = [dict(row) for row in rows[:limit]]
+    next_cursor = str(comments[-1]['comment_id']) if has_more and comments else None
+    return {"comments": comments, "next_cursor": next_cursor}
@@ -2,14 +2,28 @@ from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import jwt
 from datetime import datetime, timedelta, timezone
-import base64
 from database import get_db_connection, Database
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 import functools
+import feed
+import teams
+import search
+from auth import hasher, AuthBusyError
+from responses import flask_json, flask_list, flask_stream
+from ratelimit import limiter
 
 app = Flask(__name__)
 CORS(app)
 
+# Rate limiting runs before a database connection is opened
+@app.before_request
+def rate_limit():
+    if limiter is None or request.method == 'OPTIONS':
+        return None
+    retry_after = limiter.check(request.path, request.headers.get('Authorization'), request.remote_addr)
+    if retry_after is not None:
+        return jsonify({'detail': 'Rate limit exceeded'}), 429, {'Retry-After': str(retry_after)}
+
 # Database connection management
 @app.before_request
 def before_request():
@@ -67,8 +81,8 @@ def register():
         if existing_user:
             return jsonify({'detail': 'Email already registered'}), 400
         
-        # Hash password (simplified for demo)
-        password_hash = f"hashed_{data['password']}"
+        # Hash password on the bounded bcrypt pool
+        password_hash = hasher.hash_password(data['password'])
         
         # Insert new user
         insert_query = """
@@ -89,6 +103,8 @@ def register():
             "token_type": "bearer",
             "user": dict(new_user)
         })
+    except AuthBusyError as e:
+        return jsonify({'detail': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -102,14 +118,20 @@ def login():
         result = g.db.execute_query(query, (data['email'],))
         
         if not result:
+            hasher.burn_verify(data['password'])
             return jsonify({'detail': 'Invalid credentials'}), 401
         
         user_data = result[0]
         
-        # Verify password (simplified for demo)
-        if user_data['password_hash'] != f"hashed_{data['password']}":
+        # Verify password; legacy or under-cost hashes come back with a replacement
+        matches, new_hash = hasher.verify_password(data['password'], user_data['password_hash'])
+        if not matches:
             return jsonify({'detail': 'Invalid credentials'}), 401
         
+        if new_hash:
+            rehash_query = "UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?"
+            g.db.execute_query(rehash_query, (new_hash, user_data['user_id']))
+        
         # Create access token
         access_token = create_access_token(data={"sub": str(user_data['user_id'])})
         
@@ -123,6 +145,8 @@ def login():
                 "user_type": user_data['user_type']
             }
         })
+    except AuthBusyError as e:
+        return jsonify({'detail': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -132,7 +156,7 @@ def get_activity_options():
     try:
         query = "SELECT * FROM categories ORDER BY name"
         categories = g.db.execute_query(query)
-        return jsonify({"categories": [dict(cat) for cat in categories]})
+        return flask_list("categories", categories)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -195,25 +219,10 @@ def get_user_activities(current_user_id, user_id):
         if int(user_id) != int(current_user_id):
             return jsonify({'detail': 'Access denied'}), 403
         
-        query = """
-            SELECT a.*, c.name as category_name, u.name as user_name
-            FROM activities a
-            JOIN categories c ON a.category_id = c.category_id
-            JOIN users u ON a.user_id = u.user_id
-            WHERE a.user_id = ?
-            ORDER BY a.date_time DESC
-        """
-        activities = g.db.execute_query(query, (user_id,))
-        
-        # Convert image data to base64 for JSON response
-        result = []
-        for activity in activities:
-            activity_dict = dict(activity)
-            if activity_dict['image_data']:
-                activity_dict['image_data'] = base64.b64encode(activity_dict['image_data']).decode('utf-8')
-            result.append(activity_dict)
-        
-        return jsonify({"activities": result})
+        # Stream in chunks, one short query each; image_data is base64-encoded by the encoder.
+        # The body is sent after teardown_request, so the chunks come from their own connection.
+        activities = feed.iter_user_activities(get_db_connection, user_id)
+        return flask_stream("activities", activities)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -230,7 +239,7 @@ def get_challenges():
             ORDER BY c.start_date DESC
         """
         challenges = g.db.execute_query(query)
-        return jsonify({"challenges": [dict(challenge) for challenge in challenges]})
+        return flask_list("challenges", challenges)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -274,7 +283,7 @@ def get_user_challenges(current_user_id, user_id):
             ORDER BY uc.date_joined DESC
         """
         challenges = g.db.execute_query(query, (user_id,))
-        return jsonify({"challenges": [dict(challenge) for challenge in challenges]})
+        return flask_list("challenges", challenges)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -295,7 +304,7 @@ def get_challenge_leaderboard(challenge_id):
             ORDER BY uc.points_earned DESC, total_activity_points DESC
         """
         leaderboard = g.db.execute_query(query, (challenge_id,))
-        return jsonify({"leaderboard": [dict(entry) for entry in leaderboard]})
+        return flask_list("leaderboard", leaderboard)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -315,7 +324,7 @@ def get_global_leaderboard():
             LIMIT 50
         """
         leaderboard = g.db.execute_query(query)
-        return jsonify({"leaderboard": [dict(entry) for entry in leaderboard]})
+        return flask_list("leaderboard", leaderboard)
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
@@ -355,5 +364,193 @@ def get_user_stats(current_user_id, user_id):
     except Exception as e:
         return jsonify({'detail': str(e)}), 500
 
+# Feed endpoints
+@app.route('/feed', methods=['GET'])
+@token_required
+def get_global_feed(current_user_id):
+    try:
+        page = feed.get_feed(
+            g.db, int(current_user_id),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit')
+        )
+        return flask_json(page)
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/team-feed/<int:team_id>', methods=['GET'])
+@token_required
+def get_team_feed(current_user_id, team_id):
+    try:
+        page = feed.get_feed(
+            g.db, int(current_user_id),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit'),
+            team_id=team_id
+        )
+        return flask_json(page)
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/user-feed/<int:user_id>', methods=['GET'])
+@token_required
+def get_user_feed(current_user_id, user_id):
+    try:
+        page = feed.get_feed(
+            g.db, int(current_user_id),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit'),
+            user_id=user_id
+        )
+        return flask_json(page)
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/upvote', methods=['POST'])
+@token_required
+def upvote_activity(current_user_id):
+    try:
+        data = request.get_json()
+        activity_id = data['activity_id']
+
+        if feed.get_counts(g.db, activity_id) is None:
+            return jsonify({'detail': 'Activity not found'}), 404
+
+        if not feed.add_upvote(g.db, current_user_id, activity_id):
+            return jsonify({'detail': 'Already upvoted this activity'}), 400
+
+        return jsonify({"message": "Activity upvoted", **feed.get_counts(g.db, activity_id)})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/upvote/<int:activity_id>', methods=['DELETE'])
+@token_required
+def remove_upvote(current_user_id, activity_id):
+    try:
+        if not feed.remove_upvote(g.db, current_user_id, activity_id):
+            return jsonify({'detail': 'Upvote not found'}), 404
+
+        return jsonify({"message": "Upvote removed", **feed.get_counts(g.db, activity_id)})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/comments', methods=['POST'])
+@token_required
+def add_comment(current_user_id):
+    try:
+        data = request.get_json()
+        activity_id = data['activity_id']
+        text = (data.get('text') or '').strip()
+
+        if not text:
+            return jsonify({'detail': 'Comment text is required'}), 400
+
+        if feed.get_counts(g.db, activity_id) is None:
+            return jsonify({'detail': 'Activity not found'}), 404
+
+        comment = feed.add_comment(g.db, current_user_id, activity_id, text)
+        return jsonify({"message": "Comment added", "comment": comment})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/activity-comments/<int:activity_id>', methods=['GET'])
+def get_activity_comments(activity_id):
+    try:
+        page = feed.get_comments(
+            g.db, activity_id,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit')
+        )
+        return flask_json(page)
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+# Team endpoints
+@app.route('/team-stats/<int:team_id>', methods=['GET'])
+def get_team_stats(team_id):
+    try:
+        stats = teams.get_team_stats(g.db, team_id)
+        if stats is None:
+            return jsonify({'detail': 'Team not found'}), 404
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/team-leaderboard', methods=['GET'])
+def get_team_leaderboard():
+    try:
+        leaderboard = teams.get_team_leaderboard(g.db, request.args.get('limit'))
+        return flask_json({"leaderboard": leaderboard})
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/team-rankings/<int:team_id>', methods=['GET'])
+def get_team_rankings(team_id):
+    try:
+        if not teams.team_exists(g.db, team_id):
+            return jsonify({'detail': 'Team not found'}), 404
+        return flask_json({"rankings": teams.get_team_rankings(g.db, team_id)})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/join-team', methods=['POST'])
+@token_required
+def join_team(current_user_id):
+    try:
+        data = request.get_json()
+        team_id = data['team_id']
+
+        if not teams.team_exists(g.db, team_id):
+            return jsonify({'detail': 'Team not found'}), 404
+
+        if not teams.join_team(g.db, current_user_id, team_id):
+            return jsonify({'detail': 'Already a member of this team'}), 400
+
+        return jsonify({"message": "Successfully joined team"})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+@app.route('/leave-team', methods=['POST'])
+@token_required
+def leave_team(current_user_id):
+    try:
+        data = request.get_json()
+
+        if not teams.leave_team(g.db, current_user_id, data['team_id']):
+            return jsonify({'detail': 'Not a member of this team'}), 404
+
+        return jsonify({"message": "Successfully left team"})
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
+# Search endpoint
+@app.route('/search', methods=['GET'])
+@token_required
+def search_content(current_user_id):
+    try:
+        page = search.search(
+            g.db, request.args.get('q'),
+            types=request.args.get('type'),
+            limit=request.args.get('limit'),
+            offset=request.args.get('offset')
+        )
+        return flask_json(page)
+    except ValueError as e:
+        return jsonify({'detail': str(e)}), 400
+    except Exception as e:
+        return jsonify({'detail': str(e)}), 500
+
 if __name__ == '__main__':
+    from migrations import ensure_schema
+    ensure_schema()
     app.run(host='0.0.0.0', port=8000, debug=True)
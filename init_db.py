@@ -1,15 +1,32 @@
+import argparse
 import sqlite3
 import os
 
-def init_database():
-    """Initialize the SQLite database with schema and sample data"""
+from database import get_db_path
+from migrations import ensure_schema, create_schema
+
+def init_database(reset=False):
+    """Initialize the SQLite database with schema and sample data.
+
+    Without reset an existing database is only migrated to the current
+    schema version; with reset every table is dropped and recreated with
+    demo data.
+    """
+    db_path = get_db_path()
     
-    # Read the schema file
-    with open('schema.sql', 'r') as f:
-        schema_sql = f.read()
+    if not reset and os.path.exists(db_path):
+        if not ensure_schema(db_path):
+            print("Database schema is up to date")
+        return
 
     # Add DROP TABLE statements to clear existing tables
     drop_tables_sql = """
+    DROP TABLE IF EXISTS comments_fts;
+    DROP TABLE IF EXISTS challenges_fts;
+    DROP TABLE IF EXISTS activities_fts;
+    DROP TABLE IF EXISTS rollup_suspend;
+    DROP TABLE IF EXISTS team_totals;
+    DROP TABLE IF EXISTS user_totals;
     DROP TABLE IF EXISTS upvotes;
     DROP TABLE IF EXISTS comments;
     DROP TABLE IF EXISTS team_members;
@@ -20,16 +37,15 @@ def init_database():
     DROP TABLE IF EXISTS categories;
     DROP TABLE IF EXISTS users;
     """
-    schema_sql = drop_tables_sql + schema_sql
     
     # Connect to database
-    conn = sqlite3.connect('ecobuddy.db')
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     try:
         # Execute schema
-        cursor.executescript(schema_sql)
-        conn.commit()
+        cursor.executescript(drop_tables_sql)
+        create_schema(conn)
         print("Database schema created successfully!")
         
         # Insert demo data
@@ -128,4 +144,7 @@ def init_database():
         conn.close()
 
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description="Create or migrate the EcoBuddy database")
+    parser.add_argument("--reset", action="store_true", help="Drop all tables and reload demo data")
+    args = parser.parse_args()
+    init_database(reset=args.reset)
@@ -0,0 +1,367 @@
+"""Concurrent mixed-workload load test for flask_app.py and main.py.
+
+Each virtual user logs in and then loops over a weighted mix of scenarios
+(dashboard, leaderboard polling, feed, uploads with images, challenge
+joins) until the run ends. Per-route throughput, error rates ("database is
+locked" counted separately) and latency percentiles are printed at the end.
+
+Usage:
+    # Against a server that is already running
+    python loadtest.py --url http://localhost:8000 --users 50 --duration 60
+
+    # Start flask_app.py (or main.py with --server fastapi) on a scratch copy of the database
+    python loadtest.py --server flask --db ecobuddy.db --users 50 --duration 60
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from migrations import ensure_schema
+
+LOCKED_MARKER = "database is locked"
+LOADTEST_PASSWORD = "loadtest123"
+
+# Scenario name -> relative weight
+DEFAULT_MIX = {
+    "dashboard": 40,
+    "leaderboard": 25,
+    "feed": 10,
+    "upload": 15,
+    "join_challenge": 5,
+    "login": 5,
+}
+
+SERVER_COMMANDS = {
+    "flask": [sys.executable, "-m", "flask", "--app", "flask_app", "run", "--port", "{port}", "--with-threads"],
+    "fastapi": [sys.executable, "-m", "uvicorn", "main:app", "--port", "{port}"],
+}
+
+
+class Stats:
+    """Thread-safe per-route latency and status collection"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.locked = defaultdict(int)
+
+    def record(self, route, status, latency, body):
+        with self.lock:
+            self.latencies[route].append(latency)
+            self.statuses[route][status] += 1
+            if body and LOCKED_MARKER in body:
+                self.locked[route] += 1
+
+    def report(self, elapsed):
+        rows = []
+        with self.lock:
+            for route in sorted(self.latencies):
+                latencies = sorted(self.latencies[route])
+                statuses = self.statuses[route]
+                requests = len(latencies)
+                errors = sum(count for status, count in statuses.items() if status == "error" or status >= 500)
+                client_errors = sum(count for status, count in statuses.items()
+                                    if status != "error" and 400 <= status < 500)
+                rows.append({
+                    "route": route,
+                    "requests": requests,
+                    "rps": requests / elapsed if elapsed else 0.0,
+                    "errors": errors,
+                    "error_rate": errors / requests if requests else 0.0,
+                    "client_errors": client_errors,
+                    "locked": self.locked[route],
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+                })
+        return rows
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+        )
+    for name, (filename, content_type, data) in files.items():
+        parts.append(
+            (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+             f"Content-Type: {content_type}\r\n\r\n").encode("utf-8") + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class VirtualUser:
+    """One simulated client with its own keep-alive connection and token"""
+
+    def __init__(self, index, base_url, stats, mix, think_time, image_bytes):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.stats = stats
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+        self.think_time = think_time
+        self.image_bytes = image_bytes
+        self.email = f"loadtest{index}@ecobuddy.com"
+        self.conn = None
+        self.token = None
+        self.user_id = None
+        self.category_ids = []
+        self.challenge_ids = []
+
+    def request(self, method, path, route, body=None, content_type=None):
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            headers["Content-Type"] = content_type or "application/json"
+            if content_type is None:
+                body = json.dumps(body).encode("utf-8")
+
+        started = time.perf_counter()
+        for attempt in range(2):
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                text = response.read().decode("utf-8", errors="replace")
+                latency = time.perf_counter() - started
+                self.stats.record(route, response.status, latency, text)
+                if response.will_close:
+                    self.conn.close()
+                    self.conn = None
+                try:
+                    return response.status, json.loads(text) if text else None
+                except ValueError:
+                    return response.status, None
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Stale keep-alive connection; reconnect once before counting an error
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    break
+            except OSError:
+                if self.conn:
+                    self.conn.close()
+                self.conn = None
+                break
+        self.stats.record(route, "error", time.perf_counter() - started, None)
+        return None, None
+
+    def setup(self):
+        self.request("POST", "/register", "/register", {
+            "name": self.email.split("@")[0], "email": self.email, "password": LOADTEST_PASSWORD
+        })
+        self.login()
+        status, body = self.request("GET", "/activity-options", "/activity-options")
+        if status == 200:
+            self.category_ids = [category["category_id"] for category in body["categories"]]
+        status, body = self.request("GET", "/challenges", "/challenges")
+        if status == 200:
+            self.challenge_ids = [challenge["challenge_id"] for challenge in body["challenges"]]
+
+    def login(self):
+        self.token = None
+        status, body = self.request("POST", "/login", "/login", {
+            "email": self.email, "password": LOADTEST_PASSWORD
+        })
+        if status == 200:
+            self.token = body["access_token"]
+            self.user_id = body["user"]["user_id"]
+
+    def dashboard(self):
+        self.request("GET", f"/user-stats/{self.user_id}", "/user-stats/{id}")
+        self.request("GET", f"/user-activities/{self.user_id}", "/user-activities/{id}")
+        self.request("GET", f"/user-challenges/{self.user_id}", "/user-challenges/{id}")
+
+    def leaderboard(self):
+        self.request("GET", "/leaderboard", "/leaderboard")
+
+    def feed(self):
+        self.request("GET", "/feed?limit=20", "/feed")
+
+    def upload(self):
+        if not self.category_ids:
+            return
+        quantity = round(random.uniform(0.5, 10), 2)
+        fields = {
+            "category_id": random.choice(self.category_ids),
+            "description": "Load test activity",
+            "quantity": quantity,
+        }
+        files = {"file": ("loadtest.jpg", "image/jpeg", self.image_bytes)}
+        body, content_type = encode_multipart(fields, files)
+        self.request("POST", "/upload-activity", "/upload-activity", body, content_type)
+
+    def join_challenge(self):
+        if not self.challenge_ids:
+            return
+        self.request("POST", "/join-challenge", "/join-challenge", {
+            "challenge_id": random.choice(self.challenge_ids)
+        })
+
+    def run(self, deadline):
+        self.setup()
+        while time.monotonic() < deadline:
+            if self.token is None:
+                self.login()
+                if self.token is None:
+                    time.sleep(0.5)
+                    continue
+            scenario = random.choices(self.scenarios, weights=self.weights)[0]
+            getattr(self, scenario)()
+            if self.think_time:
+                time.sleep(random.uniform(0, 2 * self.think_time))
+        if self.conn:
+            self.conn.close()
+
+
+def start_server(server, port, db_path, rate_limit=False):
+    """Start one of the apps on a scratch copy of the database; returns (process, scratch dir).
+
+    Rate limiting is switched off unless rate_limit is set, since a handful of
+    virtual users would otherwise spend most of the run collecting 429s.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix="ecobuddy-loadtest-")
+    scratch_db = os.path.join(scratch_dir, "ecobuddy.db")
+    shutil.copyfile(db_path, scratch_db)
+    # Bring the copy up to the current schema so the run measures the app, not missing tables
+    ensure_schema(scratch_db)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{scratch_db}",
+               RATE_LIMIT_ENABLED="true" if rate_limit else "false")
+    command = [part.format(port=port) for part in SERVER_COMMANDS[server]]
+    # Server output goes to a log in the scratch dir so a failed start can say why
+    log_path = os.path.join(scratch_dir, "server.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=log, stderr=subprocess.STDOUT
+        )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, "r", errors="replace") as log:
+                tail = "".join(log.readlines()[-10:])
+            raise RuntimeError(f"{server} server exited with code {process.returncode} "
+                               f"(log: {log_path}):\n{tail}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/activity-options")
+            conn.getresponse().read()
+            conn.close()
+            return process, scratch_dir
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{server} server did not start within 30 seconds")
+
+
+def print_report(rows, elapsed, users):
+    total = sum(row["requests"] for row in rows)
+    errors = sum(row["errors"] for row in rows)
+    locked = sum(row["locked"] for row in rows)
+    print(f"\n{users} users, {elapsed:.1f}s, {total} requests, {total / elapsed if elapsed else 0:.1f} req/s, "
+          f"{errors} errors ({locked} 'database is locked')\n")
+    header = f"{'route':<26}{'reqs':>8}{'req/s':>9}{'err%':>7}{'4xx':>6}{'locked':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['route']:<26}{row['requests']:>8}{row['rps']:>9.1f}{row['error_rate'] * 100:>6.1f}%"
+              f"{row['client_errors']:>6}{row['locked']:>8}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+    print("\nLatencies in ms; err% counts 5xx responses and connection failures.")
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent mixed-workload load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running server")
+    parser.add_argument("--server", choices=sorted(SERVER_COMMANDS),
+                        help="Start this server locally instead of using --url")
+    parser.add_argument("--port", type=int, default=8765, help="Port for a server started with --server")
+    parser.add_argument("--db", default="ecobuddy.db", help="Database copied for a server started with --server")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep rate limiting on for a server started with --server (off by default)")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users are started")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Mean pause between scenarios in seconds")
+    parser.add_argument("--image-size", type=int, default=64 * 1024, help="Bytes per uploaded image")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Scenario weights, e.g. dashboard=50,upload=30")
+    parser.add_argument("--json", help="Also write the per-route report to this file")
+    args = parser.parse_args()
+
+    process = scratch_dir = None
+    base_url = args.url
+    if args.server:
+        process, scratch_dir = start_server(args.server, args.port, args.db, args.rate_limit)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        stats = Stats()
+        image_bytes = os.urandom(args.image_size)
+        started = time.monotonic()
+        deadline = started + args.ramp_up + args.duration
+        threads = []
+        for index in range(args.users):
+            user = VirtualUser(index, base_url, stats, args.mix, args.think_time, image_bytes)
+            thread = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if args.ramp_up and args.users > 1:
+                time.sleep(args.ramp_up / args.users)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        rows = stats.report(elapsed)
+        print_report(rows, elapsed, args.users)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"users": args.users, "elapsed": elapsed, "routes": rows}, f, indent=2)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
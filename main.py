@@ -1,17 +1,41 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
 import jwt
 from datetime import datetime, timedelta
 import io
-import base64
-from database import db
+from database import get_db_connection, Database
+import feed
+import teams
+import search
+from auth import hasher, AuthBusyError
+from responses import fastapi_json, fastapi_list, fastapi_stream
+from ratelimit import limiter
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 app = FastAPI(title="EcoBuddy API", version="1.0.0")
 
+# Rate limiting (registered before CORS so 429 responses still carry CORS headers)
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    if limiter is not None and request.method != "OPTIONS":
+        client_host = request.client.host if request.client else None
+        # The sqlite bucket store blocks, so keep it off the event loop
+        retry_after = await run_in_threadpool(
+            limiter.check, request.url.path, request.headers.get("authorization"), client_host
+        )
+        if retry_after is not None:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded"},
+                headers={"Retry-After": str(retry_after)}
+            )
+    return await call_next(request)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +47,17 @@ app.add_middleware(
 
 security = HTTPBearer()
 
+# Database connection management: one connection per request, like flask_app.py.
+# Sync dependencies run on the threadpool while async handlers run on the event
+# loop, so the connection is opened with check_same_thread=False; it is still only
+# ever used by one request at a time.
+def get_db():
+    conn = get_db_connection(check_same_thread=False)
+    try:
+        yield Database(conn)
+    finally:
+        conn.close()
+
 # Pydantic models
 class UserCreate(BaseModel):
     name: str
@@ -47,6 +82,12 @@ class CommentCreate(BaseModel):
     activity_id: int
     text: str
 
+class UpvoteCreate(BaseModel):
+    activity_id: int
+
+class TeamJoin(BaseModel):
+    team_id: int
+
 # Authentication functions
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -67,25 +108,28 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 # Auth endpoints
 @app.post("/register")
-async def register(user: UserCreate):
+async def register(user: UserCreate, db: Database = Depends(get_db)):
     try:
         # Check if user already exists
-        check_query = "SELECT user_id FROM users WHERE email = %s"
+        check_query = "SELECT user_id FROM users WHERE email = ?"
         existing_user = db.execute_query(check_query, (user.email,))
         
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        # Hash password (simplified for demo)
-        password_hash = f"hashed_{user.password}"
+        # Hash password on the bounded bcrypt pool without blocking the event loop
+        password_hash = await hasher.hash_password_async(user.password)
         
         # Insert new user
         insert_query = """
             INSERT INTO users (name, email, password_hash, user_type)
-            VALUES (%s, %s, %s, %s)
-            RETURNING user_id, name, email, user_type
+            VALUES (?, ?, ?, ?)
         """
-        new_user = db.execute_insert(insert_query, (user.name, user.email, password_hash, user.user_type))
+        db.execute_query(insert_query, (user.name, user.email, password_hash, user.user_type))
+        
+        # Get the new user
+        user_query = "SELECT user_id, name, email, user_type FROM users WHERE email = ?"
+        new_user = db.execute_query(user_query, (user.email,))[0]
         
         # Create access token
         access_token = create_access_token(data={"sub": str(new_user["user_id"])})
@@ -95,25 +139,35 @@ async def register(user: UserCreate):
             "token_type": "bearer",
             "user": dict(new_user)
         }
+    except HTTPException:
+        raise
+    except AuthBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/login")
-async def login(user: UserLogin):
+async def login(user: UserLogin, db: Database = Depends(get_db)):
     try:
         # Find user
-        query = "SELECT user_id, name, email, user_type, password_hash FROM users WHERE email = %s"
+        query = "SELECT user_id, name, email, user_type, password_hash FROM users WHERE email = ?"
         result = db.execute_query(query, (user.email,))
         
         if not result:
+            await hasher.burn_verify_async(user.password)
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         user_data = result[0]
         
-        # Verify password (simplified for demo)
-        if user_data["password_hash"] != f"hashed_{user.password}":
+        # Verify password; legacy or under-cost hashes come back with a replacement
+        matches, new_hash = await hasher.verify_password_async(user.password, user_data["password_hash"])
+        if not matches:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
+        if new_hash:
+            rehash_query = "UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?"
+            db.execute_query(rehash_query, (new_hash, user_data["user_id"]))
+        
         # Create access token
         access_token = create_access_token(data={"sub": str(user_data["user_id"])})
         
@@ -127,16 +181,20 @@ async def login(user: UserLogin):
                 "user_type": user_data["user_type"]
             }
         }
+    except HTTPException:
+        raise
+    except AuthBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Activity endpoints
 @app.get("/activity-options")
-async def get_activity_options():
+async def get_activity_options(db: Database = Depends(get_db)):
     try:
         query = "SELECT * FROM categories ORDER BY name"
         categories = db.execute_query(query)
-        return {"categories": [dict(cat) for cat in categories]}
+        return fastapi_list("categories", categories)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -144,12 +202,22 @@ async def get_activity_options():
 async def upload_activity(
     category_id: int = Form(...),
     description: str = Form(...),
-    points: int = Form(...),
-    carbon_offset: float = Form(...),
+    quantity: float = Form(...),
     file: Optional[UploadFile] = File(None),
-    user_id: int = Depends(verify_token)
+    user_id: int = Depends(verify_token),
+    db: Database = Depends(get_db)
 ):
     try:
+        # Points and carbon offset are derived from the category's per-unit rates
+        category_query = "SELECT points_per_unit, carbon_per_unit FROM categories WHERE category_id = ?"
+        category_data = db.execute_query(category_query, (category_id,))
+        
+        if not category_data:
+            raise HTTPException(status_code=404, detail="Category not found")
+        
+        points = quantity * category_data[0]["points_per_unit"]
+        carbon_offset = quantity * category_data[0]["carbon_per_unit"]
+        
         image_data = None
         image_filename = None
         image_content_type = None
@@ -160,16 +228,17 @@ async def upload_activity(
             image_content_type = file.content_type
         
         query = """
-            INSERT INTO activities (user_id, category_id, description, points, carbon_offset, image_data, image_filename, image_content_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING activity_id, date_time
+            INSERT INTO activities (user_id, category_id, description, quantity, points, carbon_offset, image_data, image_filename, image_content_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
-        result = db.execute_insert(query, (
-            user_id, category_id, description, points, carbon_offset,
+        db.execute_query(query, (
+            user_id, category_id, description, quantity, points, carbon_offset,
             image_data, image_filename, image_content_type
         ))
         
-        return {"message": "Activity uploaded successfully", "activity_id": result["activity_id"]}
+        return {"message": "Activity uploaded successfully", "activity_id": db.cursor.lastrowid}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -180,31 +249,18 @@ async def get_user_activities(user_id: int, current_user_id: int = Depends(verif
         if user_id != current_user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        query = """
-            SELECT a.*, c.name as category_name, u.name as user_name
-            FROM activities a
-            JOIN categories c ON a.category_id = c.category_id
-            JOIN users u ON a.user_id = u.user_id
-            WHERE a.user_id = %s
-            ORDER BY a.date_time DESC
-        """
-        activities = db.execute_query(query, (user_id,))
-        
-        # Convert image data to base64 for JSON response
-        result = []
-        for activity in activities:
-            activity_dict = dict(activity)
-            if activity_dict["image_data"]:
-                activity_dict["image_data"] = base64.b64encode(activity_dict["image_data"]).decode('utf-8')
-            result.append(activity_dict)
-        
-        return {"activities": result}
+        # Stream in chunks, one short query each; image_data is base64-encoded by the encoder.
+        # Starlette iterates the stream on its threadpool, so it gets its own connection.
+        activities = feed.iter_user_activities(lambda: get_db_connection(check_same_thread=False), user_id)
+        return fastapi_stream("activities", activities)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Challenge endpoints
 @app.get("/challenges")
-async def get_challenges():
+async def get_challenges(db: Database = Depends(get_db)):
     try:
         query = """
             SELECT c.*, 
@@ -215,15 +271,15 @@ async def get_challenges():
             ORDER BY c.start_date DESC
         """
         challenges = db.execute_query(query)
-        return {"challenges": [dict(challenge) for challenge in challenges]}
+        return fastapi_list("challenges", challenges)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/join-challenge")
-async def join_challenge(challenge: ChallengeJoin, user_id: int = Depends(verify_token)):
+async def join_challenge(challenge: ChallengeJoin, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
     try:
         # Check if user already joined
-        check_query = "SELECT * FROM user_challenges WHERE user_id = %s AND challenge_id = %s"
+        check_query = "SELECT * FROM user_challenges WHERE user_id = ? AND challenge_id = ?"
         existing = db.execute_query(check_query, (user_id, challenge.challenge_id))
         
         if existing:
@@ -232,17 +288,21 @@ async def join_challenge(challenge: ChallengeJoin, user_id: int = Depends(verify
         # Join challenge
         insert_query = """
             INSERT INTO user_challenges (user_id, challenge_id, status, points_earned)
-            VALUES (%s, %s, 'Active', 0)
-            RETURNING user_id, challenge_id, date_joined
+            VALUES (?, ?, 'Active', 0)
         """
-        result = db.execute_insert(insert_query, (user_id, challenge.challenge_id))
+        db.execute_query(insert_query, (user_id, challenge.challenge_id))
+        
+        result_query = "SELECT user_id, challenge_id, date_joined FROM user_challenges WHERE user_id = ? AND challenge_id = ?"
+        result = db.execute_query(result_query, (user_id, challenge.challenge_id))[0]
         
         return {"message": "Successfully joined challenge", "data": dict(result)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/user-challenges/{user_id}")
-async def get_user_challenges(user_id: int, current_user_id: int = Depends(verify_token)):
+async def get_user_challenges(user_id: int, current_user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
     try:
         if user_id != current_user_id:
             raise HTTPException(status_code=403, detail="Access denied")
@@ -251,16 +311,16 @@ async def get_user_challenges(user_id: int, current_user_id: int = Depends(verif
             SELECT c.*, uc.status, uc.points_earned, uc.date_joined
             FROM challenges c
             JOIN user_challenges uc ON c.challenge_id = uc.challenge_id
-            WHERE uc.user_id = %s
+            WHERE uc.user_id = ?
             ORDER BY uc.date_joined DESC
         """
         challenges = db.execute_query(query, (user_id,))
-        return {"challenges": [dict(challenge) for challenge in challenges]}
+        return fastapi_list("challenges", challenges)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/challenge-leaderboard/{challenge_id}")
-async def get_challenge_leaderboard(challenge_id: int):
+async def get_challenge_leaderboard(challenge_id: int, db: Database = Depends(get_db)):
     try:
         query = """
             SELECT u.name, u.email, uc.points_earned, uc.date_joined,
@@ -270,19 +330,19 @@ async def get_challenge_leaderboard(challenge_id: int):
             JOIN user_challenges uc ON u.user_id = uc.user_id
             LEFT JOIN activities a ON u.user_id = a.user_id 
                 AND a.date_time >= uc.date_joined
-                AND a.date_time <= uc.date_joined + INTERVAL '30 days'
-            WHERE uc.challenge_id = %s
+                AND a.date_time <= datetime(uc.date_joined, '+30 days')
+            WHERE uc.challenge_id = ?
             GROUP BY u.user_id, u.name, u.email, uc.points_earned, uc.date_joined
             ORDER BY uc.points_earned DESC, total_activity_points DESC
         """
         leaderboard = db.execute_query(query, (challenge_id,))
-        return {"leaderboard": [dict(entry) for entry in leaderboard]}
+        return fastapi_list("leaderboard", leaderboard)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Leaderboard endpoint
 @app.get("/leaderboard")
-async def get_global_leaderboard():
+async def get_global_leaderboard(db: Database = Depends(get_db)):
     try:
         query = """
             SELECT u.name, u.email, u.user_type,
@@ -296,13 +356,13 @@ async def get_global_leaderboard():
             LIMIT 50
         """
         leaderboard = db.execute_query(query)
-        return {"leaderboard": [dict(entry) for entry in leaderboard]}
+        return fastapi_list("leaderboard", leaderboard)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # User stats endpoint
 @app.get("/user-stats/{user_id}")
-async def get_user_stats(user_id: int, current_user_id: int = Depends(verify_token)):
+async def get_user_stats(user_id: int, current_user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
     try:
         if user_id != current_user_id:
             raise HTTPException(status_code=403, detail="Access denied")
@@ -317,7 +377,7 @@ async def get_user_stats(user_id: int, current_user_id: int = Depends(verify_tok
             FROM users u
             LEFT JOIN activities a ON u.user_id = a.user_id
             LEFT JOIN user_challenges uc ON u.user_id = uc.user_id
-            WHERE u.user_id = %s
+            WHERE u.user_id = ?
             GROUP BY u.user_id
         """
         stats = db.execute_query(query, (user_id,))
@@ -335,6 +395,167 @@ async def get_user_stats(user_id: int, current_user_id: int = Depends(verify_tok
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Feed endpoints
+@app.get("/feed")
+async def get_global_feed(cursor: Optional[str] = None, limit: Optional[int] = None,
+                          current_user_id: int = Depends(verify_token),
+                          db: Database = Depends(get_db)):
+    try:
+        return fastapi_json(feed.get_feed(db, current_user_id, cursor=cursor, limit=limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/team-feed/{team_id}")
+async def get_team_feed(team_id: int, cursor: Optional[str] = None, limit: Optional[int] = None,
+                        current_user_id: int = Depends(verify_token),
+                        db: Database = Depends(get_db)):
+    try:
+        return fastapi_json(feed.get_feed(db, current_user_id, cursor=cursor, limit=limit, team_id=team_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/user-feed/{user_id}")
+async def get_user_feed(user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None,
+                        current_user_id: int = Depends(verify_token),
+                        db: Database = Depends(get_db)):
+    try:
+        return fastapi_json(feed.get_feed(db, current_user_id, cursor=cursor, limit=limit, user_id=user_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/upvote")
+async def upvote_activity(upvote: UpvoteCreate, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
+    try:
+        if feed.get_counts(db, upvote.activity_id) is None:
+            raise HTTPException(status_code=404, detail="Activity not found")
+
+        if not feed.add_upvote(db, user_id, upvote.activity_id):
+            raise HTTPException(status_code=400, detail="Already upvoted this activity")
+
+        return {"message": "Activity upvoted", **feed.get_counts(db, upvote.activity_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/upvote/{activity_id}")
+async def remove_upvote(activity_id: int, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
+    try:
+        if not feed.remove_upvote(db, user_id, activity_id):
+            raise HTTPException(status_code=404, detail="Upvote not found")
+
+        return {"message": "Upvote removed", **feed.get_counts(db, activity_id)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/comments")
+async def add_comment(comment: CommentCreate, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
+    try:
+        text = comment.text.strip()
+        if not text:
+            raise HTTPException(status_code=400, detail="Comment text is required")
+
+        if feed.get_counts(db, comment.activity_id) is None:
+            raise HTTPException(status_code=404, detail="Activity not found")
+
+        return {"message": "Comment added", "comment": feed.add_comment(db, user_id, comment.activity_id, text)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/activity-comments/{activity_id}")
+async def get_activity_comments(activity_id: int, cursor: Optional[str] = None, limit: Optional[int] = None,
+                                db: Database = Depends(get_db)):
+    try:
+        return fastapi_json(feed.get_comments(db, activity_id, cursor=cursor, limit=limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Team endpoints
+@app.get("/team-stats/{team_id}")
+async def get_team_stats(team_id: int, db: Database = Depends(get_db)):
+    try:
+        stats = teams.get_team_stats(db, team_id)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Team not found")
+        return stats
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/team-leaderboard")
+async def get_team_leaderboard(limit: Optional[int] = None, db: Database = Depends(get_db)):
+    try:
+        return fastapi_json({"leaderboard": teams.get_team_leaderboard(db, limit)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/team-rankings/{team_id}")
+async def get_team_rankings(team_id: int, db: Database = Depends(get_db)):
+    try:
+        if not teams.team_exists(db, team_id):
+            raise HTTPException(status_code=404, detail="Team not found")
+        return fastapi_json({"rankings": teams.get_team_rankings(db, team_id)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/join-team")
+async def join_team(team: TeamJoin, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
+    try:
+        if not teams.team_exists(db, team.team_id):
+            raise HTTPException(status_code=404, detail="Team not found")
+
+        if not teams.join_team(db, user_id, team.team_id):
+            raise HTTPException(status_code=400, detail="Already a member of this team")
+
+        return {"message": "Successfully joined team"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/leave-team")
+async def leave_team(team: TeamJoin, user_id: int = Depends(verify_token), db: Database = Depends(get_db)):
+    try:
+        if not teams.leave_team(db, user_id, team.team_id):
+            raise HTTPException(status_code=404, detail="Not a member of this team")
+
+        return {"message": "Successfully left team"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Search endpoint
+@app.get("/search")
+async def search_content(q: str, type: Optional[str] = None, limit: Optional[int] = None,
+                         offset: Optional[int] = None, current_user_id: int = Depends(verify_token),
+                         db: Database = Depends(get_db)):
+    try:
+        return fastapi_json(search.search(db, q, types=type, limit=limit, offset=offset))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
+    from migrations import ensure_schema
+    ensure_schema()
     uvicorn.run(app, host="0.0.0.0", port=8000)
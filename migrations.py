@@ -0,0 +1,149 @@
+"""Versioned schema migrations for the SQLite database.
+
+The schema version lives in SQLite's PRAGMA user_version, so checking it
+on startup is a single header read. A new database gets schema.sql in one
+go and is stamped with the latest version; an existing one only runs the
+migrations/NNN_*.sql files newer than its stored version, each in its own
+transaction. Nothing is ever dropped.
+
+Several workers may start at once (gunicorn "server:create_app()"), so every
+change is made under BEGIN IMMEDIATE and the version is re-read inside that
+transaction: the first worker applies a migration, the others wait for the
+write lock and then find it already applied.
+
+To change the schema, update schema.sql and add the next numbered file to
+migrations/ that brings an existing database to the same state.
+"""
+import glob
+import os
+import re
+import sqlite3
+
+from database import get_db_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(BASE_DIR, "schema.sql")
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+# Seconds a worker waits for another one's migration to finish
+LOCK_TIMEOUT = 300
+
+
+def available_migrations():
+    """Return [(version, path)] sorted by version"""
+    migrations = []
+    for path in glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")):
+        match = re.match(r"(\d+)_", os.path.basename(path))
+        if match:
+            migrations.append((int(match.group(1)), path))
+    return sorted(migrations)
+
+
+def latest_version():
+    migrations = available_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def is_empty(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+    ).fetchone()[0] == 0
+
+
+def pending_migrations(conn):
+    """Return the [(version, path)] newer than the stored version, without applying them"""
+    current = get_version(conn)
+    return [(version, path) for version, path in available_migrations() if version > current]
+
+
+def split_statements(sql):
+    """Split a script into single statements (trigger bodies kept whole) for conn.execute.
+
+    executescript() would commit the surrounding transaction first, which is
+    exactly the lock these scripts need to run under.
+    """
+    statements = []
+    buffer = ""
+    for part in re.split(r"(?<=;)", sql):
+        buffer += part
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer)
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer)
+    return statements
+
+
+def _run_locked(conn, apply):
+    """Run apply(conn) inside BEGIN IMMEDIATE; returns its result"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = apply(conn)
+        conn.execute("COMMIT")
+        return result
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def create_schema(conn):
+    """Apply schema.sql to an empty database; returns False if another worker got there first"""
+    with open(SCHEMA_FILE, "r") as f:
+        schema_sql = f.read()
+
+    def apply(conn):
+        if not is_empty(conn):
+            return False
+        for statement in split_statements(schema_sql):
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {latest_version()}")
+        return True
+
+    return _run_locked(conn, apply)
+
+
+def migrate(conn, log=print):
+    """Apply every migration newer than the stored version; returns the versions applied"""
+    applied = []
+    for version, path in available_migrations():
+        if version <= get_version(conn):
+            continue
+        with open(path, "r") as f:
+            migration_sql = f.read()
+
+        def apply(conn):
+            # Re-read under the write lock: another worker may have applied it meanwhile
+            if version <= get_version(conn):
+                return False
+            log(f"Applying migration {os.path.basename(path)}")
+            for statement in split_statements(migration_sql):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            return True
+
+        if _run_locked(conn, apply):
+            applied.append(version)
+    return applied
+
+
+def ensure_schema(db_path=None, log=print):
+    """Create or migrate the database as needed; returns True if anything changed"""
+    conn = sqlite3.connect(db_path or get_db_path(), timeout=LOCK_TIMEOUT, isolation_level=None)
+    try:
+        if is_empty(conn):
+            if create_schema(conn):
+                log("Created database schema")
+                return True
+        if get_version(conn) == latest_version():
+            return False
+        return bool(migrate(conn, log))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if not ensure_schema():
+        print("Database schema is up to date")
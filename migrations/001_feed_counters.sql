@@ -0,0 +1,31 @@
+-- Denormalized upvote/comment counters on activities for the social feed
+ALTER TABLE activities ADD COLUMN upvote_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE activities ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE activities
+SET upvote_count = (SELECT COUNT(*) FROM upvotes WHERE upvotes.activity_id = activities.activity_id),
+    comment_count = (SELECT COUNT(*) FROM comments WHERE comments.activity_id = activities.activity_id);
+
+CREATE INDEX IF NOT EXISTS idx_activities_feed ON activities(date_time, activity_id);
+CREATE INDEX IF NOT EXISTS idx_activities_user_feed ON activities(user_id, date_time, activity_id);
+CREATE INDEX IF NOT EXISTS idx_team_members_team_id ON team_members(team_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_upvotes_insert AFTER INSERT ON upvotes
+BEGIN
+    UPDATE activities SET upvote_count = upvote_count + 1 WHERE activity_id = NEW.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_upvotes_delete AFTER DELETE ON upvotes
+BEGIN
+    UPDATE activities SET upvote_count = upvote_count - 1 WHERE activity_id = OLD.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_insert AFTER INSERT ON comments
+BEGIN
+    UPDATE activities SET comment_count = comment_count + 1 WHERE activity_id = NEW.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_delete AFTER DELETE ON comments
+BEGIN
+    UPDATE activities SET comment_count = comment_count - 1 WHERE activity_id = OLD.activity_id;
+END;
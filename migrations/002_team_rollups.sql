@@ -0,0 +1,131 @@
+-- Team and user rollups maintained by triggers
+
+-- Rollup of each user's activities
+CREATE TABLE IF NOT EXISTS user_totals (
+    user_id INTEGER PRIMARY KEY,
+    total_points REAL NOT NULL DEFAULT 0,
+    total_carbon_offset REAL NOT NULL DEFAULT 0,
+    activities_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(user_id) REFERENCES users(user_id)
+);
+
+-- Rollup of each team's current members
+CREATE TABLE IF NOT EXISTS team_totals (
+    team_id INTEGER PRIMARY KEY,
+    member_count INTEGER NOT NULL DEFAULT 0,
+    total_points REAL NOT NULL DEFAULT 0,
+    total_carbon_offset REAL NOT NULL DEFAULT 0,
+    activities_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(team_id) REFERENCES teams(team_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_team_members_user_id ON team_members(user_id);
+CREATE INDEX IF NOT EXISTS idx_team_totals_points ON team_totals(total_points);
+
+-- Backfill from existing rows
+INSERT OR REPLACE INTO user_totals (user_id, total_points, total_carbon_offset, activities_count)
+SELECT u.user_id, COALESCE(SUM(a.points), 0), COALESCE(SUM(a.carbon_offset), 0), COUNT(a.activity_id)
+FROM users u
+LEFT JOIN activities a ON u.user_id = a.user_id
+GROUP BY u.user_id;
+
+INSERT OR REPLACE INTO team_totals (team_id, member_count, total_points, total_carbon_offset, activities_count)
+SELECT t.team_id, COUNT(ut.user_id), COALESCE(SUM(ut.total_points), 0),
+       COALESCE(SUM(ut.total_carbon_offset), 0), COALESCE(SUM(ut.activities_count), 0)
+FROM teams t
+LEFT JOIN team_members tm ON t.team_id = tm.team_id
+LEFT JOIN user_totals ut ON tm.user_id = ut.user_id
+GROUP BY t.team_id;
+
+-- Triggers
+CREATE TRIGGER IF NOT EXISTS trg_users_insert_totals AFTER INSERT ON users
+BEGIN
+    INSERT OR IGNORE INTO user_totals (user_id) VALUES (NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_delete_totals AFTER DELETE ON users
+BEGIN
+    DELETE FROM user_totals WHERE user_id = OLD.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_teams_insert_totals AFTER INSERT ON teams
+BEGIN
+    INSERT OR IGNORE INTO team_totals (team_id) VALUES (NEW.team_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_teams_delete_totals AFTER DELETE ON teams
+BEGIN
+    DELETE FROM team_totals WHERE team_id = OLD.team_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_insert_totals AFTER INSERT ON activities
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE user_id = NEW.user_id;
+    UPDATE team_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_delete_totals AFTER DELETE ON activities
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE user_id = OLD.user_id;
+    UPDATE team_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = OLD.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_update_totals AFTER UPDATE OF user_id, points, carbon_offset ON activities
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE user_id = OLD.user_id;
+    UPDATE team_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = OLD.user_id);
+    UPDATE user_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE user_id = NEW.user_id;
+    UPDATE team_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_team_members_insert_totals AFTER INSERT ON team_members
+BEGIN
+    UPDATE team_totals
+    SET member_count = member_count + 1,
+        total_points = total_points + COALESCE((SELECT total_points FROM user_totals WHERE user_id = NEW.user_id), 0),
+        total_carbon_offset = total_carbon_offset + COALESCE((SELECT total_carbon_offset FROM user_totals WHERE user_id = NEW.user_id), 0),
+        activities_count = activities_count + COALESCE((SELECT activities_count FROM user_totals WHERE user_id = NEW.user_id), 0)
+    WHERE team_id = NEW.team_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_team_members_delete_totals AFTER DELETE ON team_members
+BEGIN
+    UPDATE team_totals
+    SET member_count = member_count - 1,
+        total_points = total_points - COALESCE((SELECT total_points FROM user_totals WHERE user_id = OLD.user_id), 0),
+        total_carbon_offset = total_carbon_offset - COALESCE((SELECT total_carbon_offset FROM user_totals WHERE user_id = OLD.user_id), 0),
+        activities_count = activities_count - COALESCE((SELECT activities_count FROM user_totals WHERE user_id = OLD.user_id), 0)
+    WHERE team_id = OLD.team_id;
+END;
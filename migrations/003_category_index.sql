@@ -0,0 +1,2 @@
+-- Lets recompute_activities.py walk one category's activities in activity_id order
+CREATE INDEX IF NOT EXISTS idx_activities_category ON activities(category_id, activity_id);
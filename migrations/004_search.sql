@@ -0,0 +1,66 @@
+-- Full-text search over activities, challenges and comments
+-- (external-content FTS5 indexes kept in sync by triggers)
+CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5(
+    description, content='activities', content_rowid='activity_id', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS challenges_fts USING fts5(
+    name, description, content='challenges', content_rowid='challenge_id', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+    text, content='comments', content_rowid='comment_id', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_insert AFTER INSERT ON activities
+BEGIN
+    INSERT INTO activities_fts(rowid, description) VALUES (NEW.activity_id, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_delete AFTER DELETE ON activities
+BEGIN
+    INSERT INTO activities_fts(activities_fts, rowid, description) VALUES ('delete', OLD.activity_id, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_update AFTER UPDATE OF description ON activities
+BEGIN
+    INSERT INTO activities_fts(activities_fts, rowid, description) VALUES ('delete', OLD.activity_id, OLD.description);
+    INSERT INTO activities_fts(rowid, description) VALUES (NEW.activity_id, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_insert AFTER INSERT ON challenges
+BEGIN
+    INSERT INTO challenges_fts(rowid, name, description) VALUES (NEW.challenge_id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_delete AFTER DELETE ON challenges
+BEGIN
+    INSERT INTO challenges_fts(challenges_fts, rowid, name, description) VALUES ('delete', OLD.challenge_id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_update AFTER UPDATE OF name, description ON challenges
+BEGIN
+    INSERT INTO challenges_fts(challenges_fts, rowid, name, description) VALUES ('delete', OLD.challenge_id, OLD.name, OLD.description);
+    INSERT INTO challenges_fts(rowid, name, description) VALUES (NEW.challenge_id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_insert AFTER INSERT ON comments
+BEGIN
+    INSERT INTO comments_fts(rowid, text) VALUES (NEW.comment_id, NEW.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_delete AFTER DELETE ON comments
+BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, text) VALUES ('delete', OLD.comment_id, OLD.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_update AFTER UPDATE OF text ON comments
+BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, text) VALUES ('delete', OLD.comment_id, OLD.text);
+    INSERT INTO comments_fts(rowid, text) VALUES (NEW.comment_id, NEW.text);
+END;
+
+-- Index the rows that already exist
+INSERT INTO activities_fts(activities_fts) VALUES ('rebuild');
+INSERT INTO challenges_fts(challenges_fts) VALUES ('rebuild');
+INSERT INTO comments_fts(comments_fts) VALUES ('rebuild');
@@ -0,0 +1,33 @@
+-- Lets bulk rewrites (recompute_activities.py --rebuild-rollups) pause the per-row
+-- rollup trigger with a row in rollup_suspend instead of dropping the trigger
+CREATE TABLE IF NOT EXISTS rollup_suspend (
+    suspend_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reason TEXT NOT NULL,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP TRIGGER IF EXISTS trg_activities_update_totals;
+CREATE TRIGGER trg_activities_update_totals AFTER UPDATE OF user_id, points, carbon_offset ON activities
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspend)
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE user_id = OLD.user_id;
+    UPDATE team_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = OLD.user_id);
+    UPDATE user_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE user_id = NEW.user_id;
+    UPDATE team_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = NEW.user_id);
+END;
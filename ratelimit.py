@@ -0,0 +1,155 @@
+"""Token-bucket rate limiting for flask_app.py and main.py.
+
+Requests are keyed by the user id in the bearer token (or the client IP
+when there is no valid token) plus the route prefix, e.g.
+"user:7:/leaderboard". Each route prefix gets the (rate, burst) budget from
+RATE_LIMITS in config.py.
+
+Two bucket stores are available:
+- MemoryBucketStore keeps buckets in a per-process dict ordered by last
+  use; idle buckets are evicted least recently used first, so memory stays
+  O(active keys).
+- SQLiteBucketStore keeps them in a small SQLite file shared by every
+  worker process, updated with one atomic UPSERT per request.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+from config import (
+    SECRET_KEY, ALGORITHM, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_DB,
+    RATE_LIMIT_IDLE_SECONDS, RATE_LIMIT_DEFAULT, RATE_LIMITS
+)
+
+
+class MemoryBucketStore:
+    def __init__(self, idle_seconds=RATE_LIMIT_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time], least recently used first
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns (allowed, tokens left)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._evict(now)
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = [tokens, now]
+            return allowed, tokens
+
+    def _evict(self, now):
+        cutoff = now - self.idle_seconds
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] >= cutoff:
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    TAKE_QUERY = """
+        INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT(key) DO UPDATE SET
+            allowed = MIN(:burst, tokens + (:now - updated) * :rate) >= 1,
+            tokens = MIN(:burst, tokens + (:now - updated) * :rate)
+                     - (MIN(:burst, tokens + (:now - updated) * :rate) >= 1),
+            updated = :now
+        RETURNING allowed, tokens
+    """
+    EVICT_EVERY = 1000
+
+    def __init__(self, path=RATE_LIMIT_DB, idle_seconds=RATE_LIMIT_IDLE_SECONDS):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                allowed INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_updated ON buckets(updated)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns (allowed, tokens left)"""
+        # Wall-clock time so every process measures refill against the same clock
+        now = time.time() if now is None else now
+        conn = self._connection()
+        allowed, tokens = conn.execute(
+            self.TAKE_QUERY, {"key": key, "rate": rate, "burst": burst, "now": now}
+        ).fetchone()
+
+        self._calls += 1
+        if self._calls % self.EVICT_EVERY == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_seconds,))
+        return bool(allowed), tokens
+
+
+class RateLimiter:
+    def __init__(self, store, limits=RATE_LIMITS, default=RATE_LIMIT_DEFAULT):
+        self.store = store
+        self.limits = limits
+        self.default = default
+
+    def check(self, path, authorization=None, remote_addr=None):
+        """Return None if the request may proceed, otherwise seconds until it may retry"""
+        route = route_prefix(path)
+        rate, burst = self.limits.get(route, self.default)
+        key = f"{identity(authorization, remote_addr)}:{route}"
+        allowed, tokens = self.store.take(key, rate, burst)
+        if allowed:
+            return None
+        return max(1, int((1 - tokens) / rate + 0.999))
+
+
+def route_prefix(path):
+    """'/user-stats/7' -> '/user-stats'; the same for Flask and FastAPI routes"""
+    return "/" + path.lstrip("/").split("/", 1)[0]
+
+
+def identity(authorization, remote_addr):
+    if authorization and authorization.startswith("Bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            return f"user:{payload['sub']}"
+        except (jwt.PyJWTError, KeyError):
+            pass
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+def create_limiter():
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return RateLimiter(SQLiteBucketStore())
+    return RateLimiter(MemoryBucketStore())
+
+
+limiter = create_limiter()
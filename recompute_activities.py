@@ -0,0 +1,242 @@
+"""Recompute activity points and carbon offset from the current category factors.
+
+points and carbon_offset are frozen into each activity row when it is
+logged (quantity * points_per_unit / carbon_per_unit). After correcting a
+factor in categories, run this to bring historical rows back in line:
+
+    python recompute_activities.py --category "Car → Train/Bus" --dry-run
+    python recompute_activities.py --category 3
+
+Activities are read in activity_id order in chunks, recalculated with NumPy
+and written back with executemany, one short transaction per chunk so live
+writers only ever wait for a single chunk. By default the user_totals /
+team_totals rollups follow along through their update trigger, which does
+four rollup UPDATEs per changed row. For large batches, --rebuild-rollups
+pauses that trigger with a row in rollup_suspend for the duration of the
+run and recomputes the rollups from scratch once at the end instead. The
+schema itself is never changed: if the process dies mid-run the row stays
+behind, the next run reports it, and a --rebuild-rollups run clears it.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from database import get_db_path, Database
+import teams
+
+DEFAULT_CHUNK_SIZE = 20000
+DIFF_SAMPLE_SIZE = 10
+# Differences below this only come from float rounding, not from a factor change
+ABS_TOLERANCE = 1e-9
+
+CHUNK_QUERY = """
+    SELECT activity_id, category_id, quantity, points, carbon_offset
+    FROM activities
+    WHERE activity_id > ? {category_filter}
+    ORDER BY activity_id
+    LIMIT ?
+"""
+
+UPDATE_QUERY = "UPDATE activities SET points = ?, carbon_offset = ? WHERE activity_id = ?"
+
+
+def suspend_rollups(conn):
+    """Pause trg_activities_update_totals by adding a rollup_suspend row"""
+    conn.execute("INSERT INTO rollup_suspend (reason) VALUES ('recompute_activities.py --rebuild-rollups')")
+
+
+def resume_rollups(conn):
+    """Clear every suspension, then rebuild the rollups the trigger did not maintain meanwhile.
+
+    Stale rows left by runs that died are cleared too, since the rebuild
+    corrects whatever drift they caused. The trigger is live again before the
+    rebuild starts, so updates from other writers are either included in the
+    rebuild or applied on top of it.
+    """
+    conn.execute("DELETE FROM rollup_suspend")
+    teams.rebuild_rollups(Database(conn))
+
+
+def stale_suspensions(conn):
+    return conn.execute("SELECT reason, started_at FROM rollup_suspend ORDER BY suspend_id").fetchall()
+
+
+def load_factors(conn, categories=None):
+    """Return {category_id: (name, points_per_unit, carbon_per_unit)} for the selected categories"""
+    rows = conn.execute(
+        "SELECT category_id, name, points_per_unit, carbon_per_unit FROM categories"
+    ).fetchall()
+    factors = {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    if not categories:
+        return factors
+
+    selected = {}
+    by_name = {name: category_id for category_id, (name, _, _) in factors.items()}
+    for category in categories:
+        category_id = int(category) if category.isdigit() else by_name.get(category)
+        if category_id not in factors:
+            raise ValueError(f"Category not found: {category}")
+        selected[category_id] = factors[category_id]
+    return selected
+
+
+def build_lookup(factors):
+    """Dense arrays indexed by category_id so a whole chunk is priced with one gather"""
+    size = max(factors) + 1
+    points_per_unit = np.full(size, np.nan)
+    carbon_per_unit = np.full(size, np.nan)
+    for category_id, (_, points, carbon) in factors.items():
+        points_per_unit[category_id] = points
+        carbon_per_unit[category_id] = carbon
+    return points_per_unit, carbon_per_unit
+
+
+def recompute_chunk(rows, points_per_unit, carbon_per_unit):
+    """Return (activity_ids, category_ids, old/new points, old/new carbon) for rows whose values change"""
+    data = np.array(rows, dtype=np.float64)
+    activity_ids = data[:, 0].astype(np.int64)
+    category_ids = data[:, 1].astype(np.int64)
+    quantity, old_points, old_carbon = data[:, 2], data[:, 3], data[:, 4]
+
+    new_points = quantity * points_per_unit[category_ids]
+    new_carbon = quantity * carbon_per_unit[category_ids]
+
+    # Absolute tolerance only: a relative one would hide small factor corrections
+    # (0.04 -> 0.0400003 is within isclose's default rtol=1e-5)
+    changed = ~(np.isclose(new_points, old_points, rtol=0, atol=ABS_TOLERANCE)
+                & np.isclose(new_carbon, old_carbon, rtol=0, atol=ABS_TOLERANCE))
+    return (
+        activity_ids[changed], category_ids[changed],
+        old_points[changed], new_points[changed],
+        old_carbon[changed], new_carbon[changed],
+    )
+
+
+def recompute(categories=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, pause=0.0,
+              rebuild_rollups=False, db_path=None, out=sys.stdout):
+    conn = sqlite3.connect(db_path or get_db_path(), timeout=30, isolation_level=None)
+    try:
+        factors = load_factors(conn, categories)
+        if not factors:
+            print("No categories to recompute", file=out)
+            return {}
+        points_per_unit, carbon_per_unit = build_lookup(factors)
+
+        placeholders = ", ".join("?" for _ in factors)
+        query = CHUNK_QUERY.format(category_filter=f"AND category_id IN ({placeholders})")
+        category_params = tuple(factors)
+
+        for reason, started_at in stale_suspensions(conn):
+            print(f"Warning: rollups suspended since {started_at} by {reason} and never resumed; "
+                  f"user/team totals may have drifted (--rebuild-rollups clears this)", file=out)
+
+        if rebuild_rollups and not dry_run:
+            suspend_rollups(conn)
+        try:
+            diff, samples = _recompute_chunks(
+                conn, query, category_params, factors, points_per_unit, carbon_per_unit,
+                chunk_size, dry_run, pause, out
+            )
+        finally:
+            if rebuild_rollups and not dry_run:
+                resume_rollups(conn)
+
+        print("Dry run - no rows written" if dry_run else "Recompute complete", file=out)
+        for category_id, (changed, points_delta, carbon_delta) in diff.items():
+            name = factors[category_id][0]
+            print(f"   {name}: {changed} rows, points {points_delta:+.2f}, "
+                  f"carbon_offset {carbon_delta:+.2f} kg", file=out)
+        if samples:
+            print("Sample changes (activity_id: points, carbon_offset):", file=out)
+            for activity_id, old_p, new_p, old_c, new_c in samples:
+                print(f"   {activity_id}: {old_p:g} -> {new_p:g}, {old_c:g} -> {new_c:g}", file=out)
+
+        if rebuild_rollups and not dry_run:
+            print("Rollups rebuilt", file=out)
+
+        if not dry_run and any(entry[0] for entry in diff.values()):
+            print("Historical rows changed; re-run analytics_export.py with --full", file=out)
+
+        return diff
+    finally:
+        conn.close()
+
+
+def _recompute_chunks(conn, query, category_params, factors, points_per_unit, carbon_per_unit,
+                      chunk_size, dry_run, pause, out):
+    """Walk the selected activities chunk by chunk; returns (diff, sample changes)"""
+    # Per-category [rows changed, points delta, carbon delta]
+    diff = {category_id: [0, 0.0, 0.0] for category_id in factors}
+    samples = []
+    scanned = 0
+    last_id = 0
+    started = time.monotonic()
+
+    while True:
+        rows = conn.execute(query, (last_id, *category_params, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        scanned += len(rows)
+
+        ids, cats, old_points, new_points, old_carbon, new_carbon = recompute_chunk(
+            rows, points_per_unit, carbon_per_unit
+        )
+
+        for category_id in np.unique(cats):
+            mask = cats == category_id
+            entry = diff[int(category_id)]
+            entry[0] += int(mask.sum())
+            entry[1] += float((new_points[mask] - old_points[mask]).sum())
+            entry[2] += float((new_carbon[mask] - old_carbon[mask]).sum())
+
+        if dry_run:
+            for i in range(min(len(ids), DIFF_SAMPLE_SIZE - len(samples))):
+                samples.append((int(ids[i]), old_points[i], new_points[i], old_carbon[i], new_carbon[i]))
+        elif len(ids):
+            updates = zip(new_points.tolist(), new_carbon.tolist(), ids.tolist())
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(UPDATE_QUERY, updates)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        elapsed = time.monotonic() - started
+        changed = sum(entry[0] for entry in diff.values())
+        print(f"   scanned {scanned} rows, {changed} changed "
+              f"({scanned / elapsed if elapsed else 0:.0f} rows/s)", file=out)
+
+        if pause:
+            time.sleep(pause)
+
+    return diff, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute activity points and carbon offset")
+    parser.add_argument("--category", action="append",
+                        help="Category id or name to recompute (repeatable; defaults to all)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Pause the per-row rollup trigger and recompute user_totals and "
+                             "team_totals from scratch afterwards (faster for large batches)")
+    parser.add_argument("--db", help="SQLite database path (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+
+    try:
+        recompute(args.category, args.chunk_size, args.dry_run, args.pause,
+                  args.rebuild_rollups, args.db)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
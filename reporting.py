@@ -0,0 +1,89 @@
+"""Carbon reports computed from the analytics_export.py snapshot.
+
+Everything here reads the columnar snapshot, never the serving database.
+
+Usage:
+    python reporting.py --snapshot exports/activities --period M
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+def load_snapshot(snapshot_dir, columns=None):
+    """Load every Parquet / Arrow part of a snapshot into one DataFrame"""
+    tables = []
+    for path in sorted(glob.glob(os.path.join(snapshot_dir, "month=*", "part-*"))):
+        if path.endswith(".parquet"):
+            tables.append(pq.read_table(path, columns=columns))
+        elif path.endswith(".arrow"):
+            with ipc.open_file(path) as reader:
+                table = reader.read_all()
+            tables.append(table.select(columns) if columns else table)
+
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+    return pa.concat_tables(tables).to_pandas()
+
+
+def carbon_by_category(df):
+    """Total carbon offset, points and activity count per category"""
+    if df.empty:
+        return pd.DataFrame(columns=["category_name", "activities", "total_points", "total_carbon_offset"])
+
+    codes, names = pd.factorize(df["category_name"], sort=True)
+    return pd.DataFrame({
+        "category_name": names,
+        "activities": np.bincount(codes, minlength=len(names)),
+        "total_points": np.bincount(codes, weights=df["points"].to_numpy(), minlength=len(names)),
+        "total_carbon_offset": np.bincount(codes, weights=df["carbon_offset"].to_numpy(), minlength=len(names)),
+    }).sort_values("total_carbon_offset", ascending=False, ignore_index=True)
+
+
+def carbon_by_period(df, period="M"):
+    """Total carbon offset per period ('D', 'W' or 'M') and category"""
+    if df.empty:
+        return pd.DataFrame(columns=["period", "category_name", "total_carbon_offset"])
+
+    periods = df["date_time"].dt.to_period(period).astype(str)
+    return (
+        df.assign(period=periods)
+        .groupby(["period", "category_name"], sort=True)["carbon_offset"]
+        .sum()
+        .reset_index(name="total_carbon_offset")
+    )
+
+
+def summary(df):
+    return {
+        "activities": int(len(df)),
+        "users": int(df["user_id"].nunique()) if not df.empty else 0,
+        "total_points": float(df["points"].sum()) if not df.empty else 0.0,
+        "total_carbon_offset": float(df["carbon_offset"].sum()) if not df.empty else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carbon report from an activities snapshot")
+    parser.add_argument("--snapshot", default="exports/activities", help="Snapshot directory")
+    parser.add_argument("--period", choices=["D", "W", "M"], default="M")
+    args = parser.parse_args()
+
+    df = load_snapshot(args.snapshot)
+    print("Summary:")
+    for key, value in summary(df).items():
+        print(f"   {key}: {value}")
+    print("\nCarbon by category:")
+    print(carbon_by_category(df).to_string(index=False))
+    print(f"\nCarbon by period ({args.period}):")
+    print(carbon_by_period(df, args.period).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Fast JSON encoding for list responses in flask_app.py and main.py.
+
+List endpoints encode sqlite3.Row results with orjson straight from their
+column tuples: column names are encoded once per result set and each value
+is appended to them, so no per-row dict is built. Large arrays can be
+streamed from batches of rows so the full list is never held in memory.
+BLOB columns (activity images) are emitted as base64 strings.
+
+rows_to_dicts remains for shared query helpers (teams.py) that return
+data rather than a response.
+"""
+import base64
+
+import orjson
+
+
+def _default(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=_default)
+
+
+def rows_to_dicts(rows):
+    """Map rows to dicts with the column names read once per result set"""
+    if not rows:
+        return []
+    columns = rows[0].keys()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encode_keys(columns):
+    """Pre-encode column names as the b'"name":' prefixes used by encode_rows"""
+    return [dumps(column) + b':' for column in columns]
+
+
+def encode_rows(rows, keys):
+    """Encode a batch of row tuples as the comma-separated body of a JSON array of objects"""
+    return b','.join(
+        b'{' + b','.join(key + dumps(value) for key, value in zip(keys, row)) + b'}'
+        for row in rows
+    )
+
+
+def encode_list(key, rows):
+    """Encode {"<key>": [...]} from a list of sqlite3.Row"""
+    body = encode_rows(rows, encode_keys(rows[0].keys())) if rows else b''
+    return b'{' + dumps(key) + b':[' + body + b']}'
+
+
+def iter_json_array(key, chunks):
+    """Yield {"<key>": [...]} as bytes from an iterable of sqlite3.Row batches"""
+    yield b'{' + dumps(key) + b':['
+    keys = None
+    for rows in chunks:
+        if not rows:
+            continue
+        if keys is None:
+            keys = encode_keys(rows[0].keys())
+            yield encode_rows(rows, keys)
+        else:
+            yield b',' + encode_rows(rows, keys)
+    yield b']}'
+
+
+# Flask helpers
+def flask_json(payload, status=200):
+    from flask import Response
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def flask_list(key, rows):
+    from flask import Response
+    return Response(encode_list(key, rows), mimetype='application/json')
+
+
+def flask_stream(key, chunks):
+    from flask import Response
+    return Response(iter_json_array(key, chunks), mimetype='application/json')
+
+
+# FastAPI helpers
+def fastapi_json(payload, status_code=200):
+    from fastapi.responses import Response
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json")
+
+
+def fastapi_list(key, rows):
+    from fastapi.responses import Response
+    return Response(content=encode_list(key, rows), media_type="application/json")
+
+
+def fastapi_stream(key, chunks):
+    from fastapi.responses import StreamingResponse
+    return StreamingResponse(iter_json_array(key, chunks), media_type="application/json")
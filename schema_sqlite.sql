@@ -33,6 +33,8 @@ CREATE TABLE IF NOT EXISTS activities (
     image_data BLOB,
     image_filename TEXT,
     image_content_type TEXT,
+    upvote_count INTEGER NOT NULL DEFAULT 0,
+    comment_count INTEGER NOT NULL DEFAULT 0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -98,6 +100,215 @@ CREATE INDEX IF NOT EXISTS idx_user_challenges_user_id ON user_challenges(user_i
 CREATE INDEX IF NOT EXISTS idx_user_challenges_challenge_id ON user_challenges(challenge_id);
 CREATE INDEX IF NOT EXISTS idx_comments_activity_id ON comments(activity_id);
 CREATE INDEX IF NOT EXISTS idx_upvotes_activity_id ON upvotes(activity_id);
+CREATE INDEX IF NOT EXISTS idx_activities_feed ON activities(date_time, activity_id);
+CREATE INDEX IF NOT EXISTS idx_activities_user_feed ON activities(user_id, date_time, activity_id);
+CREATE INDEX IF NOT EXISTS idx_team_members_team_id ON team_members(team_id);
+CREATE INDEX IF NOT EXISTS idx_activities_category ON activities(category_id, activity_id);
+
+-- Counter triggers keep activities.upvote_count / comment_count in sync
+CREATE TRIGGER IF NOT EXISTS trg_upvotes_insert AFTER INSERT ON upvotes
+BEGIN
+    UPDATE activities SET upvote_count = upvote_count + 1 WHERE activity_id = NEW.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_upvotes_delete AFTER DELETE ON upvotes
+BEGIN
+    UPDATE activities SET upvote_count = upvote_count - 1 WHERE activity_id = OLD.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_insert AFTER INSERT ON comments
+BEGIN
+    UPDATE activities SET comment_count = comment_count + 1 WHERE activity_id = NEW.activity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_delete AFTER DELETE ON comments
+BEGIN
+    UPDATE activities SET comment_count = comment_count - 1 WHERE activity_id = OLD.activity_id;
+END;
+
+-- User totals (rollup of each user's activities, maintained by triggers)
+CREATE TABLE IF NOT EXISTS user_totals (
+    user_id INTEGER PRIMARY KEY,
+    total_points REAL NOT NULL DEFAULT 0,
+    total_carbon_offset REAL NOT NULL DEFAULT 0,
+    activities_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(user_id) REFERENCES users(user_id)
+);
+
+-- Team totals (rollup of current members' user_totals, maintained by triggers)
+CREATE TABLE IF NOT EXISTS team_totals (
+    team_id INTEGER PRIMARY KEY,
+    member_count INTEGER NOT NULL DEFAULT 0,
+    total_points REAL NOT NULL DEFAULT 0,
+    total_carbon_offset REAL NOT NULL DEFAULT 0,
+    activities_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(team_id) REFERENCES teams(team_id)
+);
+
+-- A row here pauses the per-row activity rollup trigger during bulk rewrites
+CREATE TABLE IF NOT EXISTS rollup_suspend (
+    suspend_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reason TEXT NOT NULL,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_team_members_user_id ON team_members(user_id);
+CREATE INDEX IF NOT EXISTS idx_team_totals_points ON team_totals(total_points);
+
+-- Rollup triggers
+CREATE TRIGGER IF NOT EXISTS trg_users_insert_totals AFTER INSERT ON users
+BEGIN
+    INSERT OR IGNORE INTO user_totals (user_id) VALUES (NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_delete_totals AFTER DELETE ON users
+BEGIN
+    DELETE FROM user_totals WHERE user_id = OLD.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_teams_insert_totals AFTER INSERT ON teams
+BEGIN
+    INSERT OR IGNORE INTO team_totals (team_id) VALUES (NEW.team_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_teams_delete_totals AFTER DELETE ON teams
+BEGIN
+    DELETE FROM team_totals WHERE team_id = OLD.team_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_insert_totals AFTER INSERT ON activities
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE user_id = NEW.user_id;
+    UPDATE team_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_delete_totals AFTER DELETE ON activities
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE user_id = OLD.user_id;
+    UPDATE team_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = OLD.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_update_totals AFTER UPDATE OF user_id, points, carbon_offset ON activities
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspend)
+BEGIN
+    UPDATE user_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE user_id = OLD.user_id;
+    UPDATE team_totals
+    SET total_points = total_points - OLD.points,
+        total_carbon_offset = total_carbon_offset - OLD.carbon_offset,
+        activities_count = activities_count - 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = OLD.user_id);
+    UPDATE user_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE user_id = NEW.user_id;
+    UPDATE team_totals
+    SET total_points = total_points + NEW.points,
+        total_carbon_offset = total_carbon_offset + NEW.carbon_offset,
+        activities_count = activities_count + 1
+    WHERE team_id IN (SELECT team_id FROM team_members WHERE user_id = NEW.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_team_members_insert_totals AFTER INSERT ON team_members
+BEGIN
+    UPDATE team_totals
+    SET member_count = member_count + 1,
+        total_points = total_points + COALESCE((SELECT total_points FROM user_totals WHERE user_id = NEW.user_id), 0),
+        total_carbon_offset = total_carbon_offset + COALESCE((SELECT total_carbon_offset FROM user_totals WHERE user_id = NEW.user_id), 0),
+        activities_count = activities_count + COALESCE((SELECT activities_count FROM user_totals WHERE user_id = NEW.user_id), 0)
+    WHERE team_id = NEW.team_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_team_members_delete_totals AFTER DELETE ON team_members
+BEGIN
+    UPDATE team_totals
+    SET member_count = member_count - 1,
+        total_points = total_points - COALESCE((SELECT total_points FROM user_totals WHERE user_id = OLD.user_id), 0),
+        total_carbon_offset = total_carbon_offset - COALESCE((SELECT total_carbon_offset FROM user_totals WHERE user_id = OLD.user_id), 0),
+        activities_count = activities_count - COALESCE((SELECT activities_count FROM user_totals WHERE user_id = OLD.user_id), 0)
+    WHERE team_id = OLD.team_id;
+END;
+
+-- Full-text search (external-content FTS5 indexes kept in sync by triggers)
+CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5(
+    description, content='activities', content_rowid='activity_id', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS challenges_fts USING fts5(
+    name, description, content='challenges', content_rowid='challenge_id', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+    text, content='comments', content_rowid='comment_id', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_insert AFTER INSERT ON activities
+BEGIN
+    INSERT INTO activities_fts(rowid, description) VALUES (NEW.activity_id, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_delete AFTER DELETE ON activities
+BEGIN
+    INSERT INTO activities_fts(activities_fts, rowid, description) VALUES ('delete', OLD.activity_id, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_activities_fts_update AFTER UPDATE OF description ON activities
+BEGIN
+    INSERT INTO activities_fts(activities_fts, rowid, description) VALUES ('delete', OLD.activity_id, OLD.description);
+    INSERT INTO activities_fts(rowid, description) VALUES (NEW.activity_id, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_insert AFTER INSERT ON challenges
+BEGIN
+    INSERT INTO challenges_fts(rowid, name, description) VALUES (NEW.challenge_id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_delete AFTER DELETE ON challenges
+BEGIN
+    INSERT INTO challenges_fts(challenges_fts, rowid, name, description) VALUES ('delete', OLD.challenge_id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_update AFTER UPDATE OF name, description ON challenges
+BEGIN
+    INSERT INTO challenges_fts(challenges_fts, rowid, name, description) VALUES ('delete', OLD.challenge_id, OLD.name, OLD.description);
+    INSERT INTO challenges_fts(rowid, name, description) VALUES (NEW.challenge_id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_insert AFTER INSERT ON comments
+BEGIN
+    INSERT INTO comments_fts(rowid, text) VALUES (NEW.comment_id, NEW.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_delete AFTER DELETE ON comments
+BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, text) VALUES ('delete', OLD.comment_id, OLD.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_comments_fts_update AFTER UPDATE OF text ON comments
+BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, text) VALUES ('delete', OLD.comment_id, OLD.text);
+    INSERT INTO comments_fts(rowid, text) VALUES (NEW.comment_id, NEW.text);
+END;
 
 -- Insert default categories
 INSERT OR IGNORE INTO categories (name, description, carbon_per_point) VALUES
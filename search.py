@@ -0,0 +1,100 @@
+import re
+
+# Full-text search shared by flask_app.py and main.py.
+# Backed by the activities_fts, challenges_fts and comments_fts FTS5 indexes
+# in schema.sql, which triggers keep in sync with their source tables.
+# Results are ranked with bm25 and paginated with limit/offset per type:
+# bm25 scores depend on each index's own term statistics, so scores from
+# different tables are not comparable and the types are never merged.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+MAX_OFFSET = 1000
+SEARCH_TYPES = ("activities", "challenges", "comments")
+
+SEARCH_QUERIES = {
+    "activities": """
+        SELECT 'activity' as type, a.activity_id as id,
+               bm25(activities_fts) as rank,
+               snippet(activities_fts, 0, '[', ']', '…', 12) as snippet,
+               a.description, a.date_time, a.points, a.carbon_offset,
+               a.user_id, u.name as user_name, c.name as category_name
+        FROM activities_fts
+        JOIN activities a ON a.activity_id = activities_fts.rowid
+        JOIN users u ON a.user_id = u.user_id
+        JOIN categories c ON a.category_id = c.category_id
+        WHERE activities_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """,
+    "challenges": """
+        SELECT 'challenge' as type, ch.challenge_id as id,
+               bm25(challenges_fts, 2.0, 1.0) as rank,
+               snippet(challenges_fts, -1, '[', ']', '…', 12) as snippet,
+               ch.name, ch.description, ch.start_date, ch.end_date, ch.reward_points
+        FROM challenges_fts
+        JOIN challenges ch ON ch.challenge_id = challenges_fts.rowid
+        WHERE challenges_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """,
+    "comments": """
+        SELECT 'comment' as type, cm.comment_id as id,
+               bm25(comments_fts) as rank,
+               snippet(comments_fts, 0, '[', ']', '…', 12) as snippet,
+               cm.text, cm.date_posted, cm.activity_id,
+               cm.user_id, u.name as user_name
+        FROM comments_fts
+        JOIN comments cm ON cm.comment_id = comments_fts.rowid
+        JOIN users u ON cm.user_id = u.user_id
+        WHERE comments_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """,
+}
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so FTS5 operators and punctuation in user input are
+    never interpreted as query syntax.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def parse_types(types):
+    if not types or types == "all":
+        return SEARCH_TYPES
+    selected = tuple(t.strip() for t in types.split(","))
+    for search_type in selected:
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Unknown search type: {search_type}")
+    return selected
+
+
+def search(db, text, types=None, limit=None, offset=None):
+    """Return one ranked page of matches for each selected type.
+
+    The same limit/offset applies to every type; to page further through
+    one of them, request that type alone with its next_offset.
+    """
+    match_query = build_match_query(text)
+    if not match_query:
+        raise ValueError("Search query is required")
+
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    offset = max(0, min(int(offset or 0), MAX_OFFSET))
+    selected = parse_types(types)
+
+    page = {}
+    for search_type in selected:
+        # Fetch one extra row to know whether there is a next page
+        rows = db.execute_query(SEARCH_QUERIES[search_type], (match_query, limit + 1, offset))
+        has_more = len(rows) > limit
+        page[search_type] = {
+            "results": [dict(row) for row in rows[:limit]],
+            "next_offset": offset + limit if has_more and offset + limit <= MAX_OFFSET else None,
+        }
+    return page
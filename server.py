@@ -0,0 +1,137 @@
+"""App-factory entry point for both API implementations.
+
+    python server.py                       # flask_app.py on port 8000
+    python server.py --app fastapi         # main.py via uvicorn
+    python server.py --startup-report      # where cold-start time goes
+
+WSGI/ASGI servers can call the factory directly, e.g.
+gunicorn "server:create_app()" or uvicorn --factory "server:create_fastapi".
+
+Only the selected framework is imported, and the schema check costs a
+single PRAGMA read unless a migration is actually pending.
+"""
+import argparse
+import importlib
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from database import get_db_path
+from migrations import ensure_schema, is_empty, pending_migrations
+
+APP_MODULES = {
+    "flask": "flask_app",
+    "fastapi": "main",
+}
+
+
+def create_app(kind=None, check_schema=True):
+    kind = kind or os.getenv("ECOBUDDY_APP", "flask")
+    if check_schema:
+        ensure_schema()
+    return importlib.import_module(APP_MODULES[kind]).app
+
+
+def create_fastapi():
+    return create_app("fastapi")
+
+
+def import_breakdown(kind, top=15):
+    """Run `python -X importtime` on the app module in a fresh interpreter.
+
+    Returns (app module entry, slowest direct imports), each entry being
+    (module, self us, cumulative us).
+    """
+    app_module = APP_MODULES[kind]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {app_module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    # importtime prints a module after everything it imported, two spaces of nesting per level
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        entry = (module.strip(), int(self_us), int(cumulative_us))
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            if entry[0] == app_module:
+                children.sort(key=lambda child: child[2], reverse=True)
+                return entry, children[:top]
+            children = []
+    return None, []
+
+
+def check_schema_readonly():
+    """The startup schema check without applying anything; returns a description of pending work"""
+    conn = sqlite3.connect(f"file:{get_db_path()}?mode=ro", uri=True)
+    try:
+        if is_empty(conn):
+            return ["schema.sql (empty database)"]
+        return [os.path.basename(path) for _, path in pending_migrations(conn)]
+    finally:
+        conn.close()
+
+
+def startup_report(kind):
+    """Print where cold-start time goes; read-only, pending migrations are listed, not applied"""
+    timings = []
+    started = time.perf_counter()
+    pending = check_schema_readonly()
+    timings.append(("schema check", time.perf_counter() - started))
+
+    started = time.perf_counter()
+    create_app(kind, check_schema=False)
+    timings.append((f"import {APP_MODULES[kind]}", time.perf_counter() - started))
+
+    print(f"Startup ({kind}):")
+    for phase, seconds in timings:
+        print(f"   {phase:<20}{seconds * 1000:>9.1f} ms")
+    print(f"   {'total':<20}{sum(seconds for _, seconds in timings) * 1000:>9.1f} ms")
+
+    if pending:
+        print("\nPending (applied on the next normal start, not timed above):")
+        for name in pending:
+            print(f"   {name}")
+
+    app_entry, children = import_breakdown(kind)
+    if app_entry is None:
+        print("\nCould not measure import times")
+        return
+    print("\nImport times (fresh interpreter, -X importtime):")
+    print(f"   {'module':<30}{'self ms':>10}{'cumul ms':>10}")
+    for module, self_us, cumulative_us in [app_entry] + children:
+        name = module if module == app_entry[0] else f"  {module}"
+        print(f"   {name:<30}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the EcoBuddy API")
+    parser.add_argument("--app", choices=sorted(APP_MODULES), default=os.getenv("ECOBUDDY_APP", "flask"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print a startup-time and import-time breakdown and exit "
+                             "(read-only: pending migrations are listed, not applied)")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        startup_report(args.app)
+        return
+
+    app = create_app(args.app)
+    if args.app == "fastapi":
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from responses import rows_to_dicts
+
+# Team queries shared by flask_app.py and main.py.
+# Totals are read from the user_totals and team_totals rollups, which
+# triggers in schema.sql keep in sync as activities are logged and members
+# join or leave, so no endpoint here joins users against activities.
+
+DEFAULT_LEADERBOARD_SIZE = 50
+MAX_LEADERBOARD_SIZE = 200
+
+
+def parse_limit(limit):
+    if limit is None:
+        return DEFAULT_LEADERBOARD_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid limit")
+    return max(1, min(limit, MAX_LEADERBOARD_SIZE))
+
+
+def get_team_stats(db, team_id):
+    query = """
+        SELECT t.team_id, t.team_name, t.description, t.date_created,
+               tt.member_count, tt.total_points, tt.total_carbon_offset,
+               tt.activities_count
+        FROM teams t
+        JOIN team_totals tt ON t.team_id = tt.team_id
+        WHERE t.team_id = ?
+    """
+    result = db.execute_query(query, (team_id,))
+    return dict(result[0]) if result else None
+
+
+def get_team_leaderboard(db, limit=None):
+    query = """
+        SELECT t.team_id, t.team_name, t.description,
+               tt.member_count, tt.total_points, tt.total_carbon_offset,
+               tt.activities_count
+        FROM team_totals tt
+        JOIN teams t ON t.team_id = tt.team_id
+        ORDER BY tt.total_points DESC, tt.team_id
+        LIMIT ?
+    """
+    return rows_to_dicts(db.execute_query(query, (parse_limit(limit),)))
+
+
+def get_team_rankings(db, team_id):
+    """Rank the members of a team by their total points"""
+    query = """
+        SELECT u.user_id, u.name, u.user_type, tm.join_date,
+               ut.total_points, ut.total_carbon_offset, ut.activities_count
+        FROM team_members tm
+        JOIN users u ON tm.user_id = u.user_id
+        JOIN user_totals ut ON tm.user_id = ut.user_id
+        WHERE tm.team_id = ?
+        ORDER BY ut.total_points DESC, u.user_id
+    """
+    members = db.execute_query(query, (team_id,))
+    rankings = []
+    for rank, member in enumerate(members, start=1):
+        entry = dict(member)
+        entry['rank'] = rank
+        rankings.append(entry)
+    return rankings
+
+
+def team_exists(db, team_id):
+    return bool(db.execute_query("SELECT 1 FROM teams WHERE team_id = ?", (team_id,)))
+
+
+def join_team(db, user_id, team_id):
+    """Add a user to a team; returns False if they are already a member"""
+    query = "INSERT OR IGNORE INTO team_members (user_id, team_id) VALUES (?, ?)"
+    db.execute_query(query, (user_id, team_id))
+    return db.cursor.rowcount > 0
+
+
+def leave_team(db, user_id, team_id):
+    query = "DELETE FROM team_members WHERE user_id = ? AND team_id = ?"
+    db.execute_query(query, (user_id, team_id))
+    return db.cursor.rowcount > 0
+
+
+def rebuild_rollups(db):
+    """Recompute user_totals and team_totals from scratch.
+
+    Only needed to backfill an existing database or to repair drift; normal
+    writes keep the rollups current through triggers.
+    """
+    db.cursor.executescript("""
+        BEGIN;
+        DELETE FROM user_totals;
+        INSERT INTO user_totals (user_id, total_points, total_carbon_offset, activities_count)
+        SELECT u.user_id,
+               COALESCE(SUM(a.points), 0),
+               COALESCE(SUM(a.carbon_offset), 0),
+               COUNT(a.activity_id)
+        FROM users u
+        LEFT JOIN activities a ON u.user_id = a.user_id
+        GROUP BY u.user_id;
+
+        DELETE FROM team_totals;
+        INSERT INTO team_totals (team_id, member_count, total_points, total_carbon_offset, activities_count)
+        SELECT t.team_id,
+               COUNT(ut.user_id),
+               COALESCE(SUM(ut.total_points), 0),
+               COALESCE(SUM(ut.total_carbon_offset), 0),
+               COALESCE(SUM(ut.activities_count), 0)
+        FROM teams t
+        LEFT JOIN team_members tm ON t.team_id = tm.team_id
+        LEFT JOIN user_totals ut ON tm.user_id = ut.user_id
+        GROUP BY t.team_id;
+        COMMIT;
+    """)